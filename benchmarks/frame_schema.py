@@ -0,0 +1,142 @@
+"""
+compares the memory of the assembled training frame built the original way
+(store attributes tiled across every row as python objects, float64 features)
+with the compact schema in frame_schema, checking both hold the same values.
+
+run from the repository root:
+    python -m benchmarks.frame_schema [n_stores] [n_days]
+"""
+
+import datetime
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data_cleanup import clean_data, clean_weather
+from data_warehouse import RedshiftDW
+from elastic_net_model import regressors, predictor
+from main import build_store_frame, assemble_store_frames
+from weather_dictionaries import cloud_enumeration_dict, rain_enumeration_dict
+
+logging.disable(logging.INFO)
+
+default_n_stores = 300
+default_n_days = 120
+store_columns = [
+    "region_number",
+    "location_number",
+    "is_closed_sunday",
+    "summer_hours_open",
+    "summer_hours_close",
+    "winter_hours_open",
+    "winter_hours_close",
+    "time_zone",
+]
+
+
+def create_inputs(n_stores: int, n_days: int, rng: np.random.Generator) -> list:
+    conditions = list(cloud_enumeration_dict) + list(rain_enumeration_dict)
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    days = pd.date_range(end=end, periods=n_days, freq="D")
+    inputs = []
+    for i in range(n_stores):
+        daily_weather = pd.DataFrame(
+            {
+                "weather_date": days,
+                "condition_text": rng.choice(conditions, n_days),
+                "total_precipitation": rng.gamma(0.3, 0.2, n_days),
+            }
+        )
+        weather = RedshiftDW.convert_daily_weather_to_hourly_dataframe(None, daily_weather)
+        orders = pd.DataFrame(
+            {
+                "date_time": weather["date_time"],
+                "car_count": rng.poisson(8, weather.shape[0]).astype(np.float64),
+            }
+        )
+        store = pd.Series(
+            [str(i % 40), str(10000 + i), i % 2, 7, 19, 8, 18, "America/Chicago"],
+            index=store_columns,
+        )
+        inputs.append((weather, store, orders))
+    return inputs
+
+
+def legacy_build_store_frame(
+    weather: pd.DataFrame, store: pd.Series, orders: pd.DataFrame
+) -> pd.DataFrame:
+    data = pd.merge(weather, orders, how="left", on="date_time")
+    store_info_df = pd.DataFrame(
+        np.tile(store.to_numpy(dtype=object), [data.shape[0], 1]), columns=store.index
+    )
+    for column in data.columns:
+        store_info_df.insert(len(store_info_df.columns), column, data[column])
+    clean_data(store_info_df)
+    # the original cleaning produced every feature as float64
+    for column in regressors + predictor:
+        store_info_df[column] = store_info_df[column].astype(np.float64)
+    return store_info_df
+
+
+def legacy_assemble(inputs: list) -> pd.DataFrame:
+    return pd.concat(
+        [legacy_build_store_frame(*item) for item in inputs], ignore_index=True
+    )
+
+
+def compact_assemble(inputs: list) -> pd.DataFrame:
+    store_frames = []
+    for weather, store, orders in inputs:
+        clean_weather(weather)
+        store_frames.append((store, build_store_frame(weather, store, orders)))
+    return assemble_store_frames(store_frames)
+
+
+def measure(fn, inputs: list) -> tuple[float, int, pd.DataFrame]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(inputs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def run(n_stores: int, n_days: int) -> None:
+    inputs = create_inputs(n_stores, n_days, np.random.default_rng(0))
+    legacy_seconds, legacy_peak, legacy_df = measure(legacy_assemble, inputs)
+    seconds, peak, compact_df = measure(compact_assemble, inputs)
+
+    assert list(legacy_df.columns) == list(compact_df.columns)
+    np.testing.assert_allclose(
+        legacy_df[regressors + predictor].to_numpy(dtype=np.float64),
+        compact_df[regressors + predictor].to_numpy(dtype=np.float64),
+        rtol=1e-6,
+    )
+    for column in store_columns + ["condition"]:
+        assert (legacy_df[column].astype(str) == compact_df[column].astype(str)).all()
+
+    print(f"{n_stores} stores x {n_days} days, {compact_df.shape[0]} rows")
+    print(f"{'':>8} {'seconds':>9} {'frame MiB':>10} {'bytes/row':>10} {'peak MiB':>9}")
+    for name, s, p, df in [
+        ("legacy", legacy_seconds, legacy_peak, legacy_df),
+        ("compact", seconds, peak, compact_df),
+    ]:
+        frame_bytes = df.memory_usage(index=True, deep=True).sum()
+        print(
+            f"{name:>8} {s:>9.2f} {frame_bytes / 2**20:>10.1f} "
+            f"{frame_bytes / df.shape[0]:>10.0f} {p / 2**20:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else default_n_stores,
+        int(sys.argv[2]) if len(sys.argv) > 2 else default_n_days,
+    )
@@ -0,0 +1,102 @@
+"""
+compares the original iterrows/concat daily-to-hourly weather expansion with
+RedshiftDW.convert_daily_weather_to_hourly_dataframe for 1, 3 and 10 years of
+daily rows, checking the two produce the same frame.
+
+run from the repository root:
+    python -m benchmarks.hourly_weather
+"""
+
+import datetime
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_warehouse import RedshiftDW
+from weather_dictionaries import *
+
+logging.disable(logging.INFO)
+
+years_to_benchmark = [1, 3, 10]
+
+
+def legacy_convert_daily_weather_to_hourly_dataframe(
+    daily_weather_df: pd.DataFrame,
+) -> pd.DataFrame:
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    converted_df = pd.DataFrame([], columns=["date_time", "condition", "precipitation"])
+    for row in daily_weather_df.iterrows():
+        date = row[1]["weather_date"]
+
+        if yesterday - date < datetime.timedelta(0):
+            continue
+
+        condition = row[1]["condition_text"]
+        precipitation = (
+            row[1]["total_precipitation"]
+            if row[1]["total_precipitation"] != None
+            else 0
+        )
+
+        hourly_weather_array = []
+        for hour in range(0, 24):
+            hour_timestamp = datetime.datetime(date.year, date.month, date.day, hour)
+            hourly_weather_array.append([hour_timestamp, condition, precipitation / 24])
+
+        converted_df = pd.concat(
+            [
+                converted_df,
+                pd.DataFrame(
+                    hourly_weather_array,
+                    columns=["date_time", "condition", "precipitation"],
+                ),
+            ]
+        )
+    return converted_df
+
+
+def create_daily_weather_df(years: int, rng: np.random.Generator) -> pd.DataFrame:
+    conditions = list(rain_enumeration_dict.keys()) + list(cloud_enumeration_dict.keys())
+    n = years * 365
+    start = datetime.date.today() - datetime.timedelta(days=n)
+    precipitation = rng.gamma(0.5, 4.0, n).round(2).astype(object)
+    precipitation[rng.random(n) < 0.05] = None
+    return pd.DataFrame(
+        {
+            "weather_date": [start + datetime.timedelta(days=i) for i in range(n)],
+            "condition_text": rng.choice(conditions, n),
+            "total_precipitation": precipitation,
+        }
+    )
+
+
+def time_call(fn, *args) -> tuple[float, pd.DataFrame]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def run() -> None:
+    dw = RedshiftDW.__new__(RedshiftDW)
+    rng = np.random.default_rng(0)
+
+    print(f"{'years':>5} {'days':>6} {'legacy s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for years in years_to_benchmark:
+        daily_weather_df = create_daily_weather_df(years, rng)
+        legacy_seconds, legacy_df = time_call(
+            legacy_convert_daily_weather_to_hourly_dataframe, daily_weather_df
+        )
+        vectorized_seconds, vectorized_df = time_call(
+            dw.convert_daily_weather_to_hourly_dataframe, daily_weather_df
+        )
+        pd.testing.assert_frame_equal(legacy_df, vectorized_df)
+        print(
+            f"{years:>5} {daily_weather_df.shape[0]:>6} {legacy_seconds:>10.3f} "
+            f"{vectorized_seconds:>13.4f} {legacy_seconds / vectorized_seconds:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    run()
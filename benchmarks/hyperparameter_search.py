@@ -0,0 +1,100 @@
+"""
+compares the ElasticNetModel search strategies against the exhaustive grid on a
+synthetic region, reporting the number of fits, wall time and best MAE.
+
+the exhaustive grid is shrunk to grid_size points per axis, and cross
+validation and max_iter are cut down, so the benchmark finishes on a laptop.
+every strategy runs with the same settings and folds. the ridge (l1_ratio = 0)
+and unregularized (alpha = 0) edges of the grid never converge and run to
+max_iter, so they dominate the exhaustive grid's wall time in production.
+
+run from the repository root:
+    python -m benchmarks.hyperparameter_search [n_rows] [grid_size]
+"""
+
+import logging
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from elastic_net_model import ElasticNetModel, regressors, predictor, search_strategies
+
+logging.disable(logging.INFO)
+warnings.filterwarnings("ignore")
+
+default_n_rows = 2000
+default_grid_size = 20
+cv_splits = 5
+cv_repeats = 1
+max_iter = 2000
+
+
+def create_region_df(n_rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "hour": rng.integers(7, 19, n_rows).astype(np.float64),
+            "precipitation": rng.gamma(0.3, 0.05, n_rows),
+            "is_holiday": (rng.random(n_rows) < 0.01).astype(np.float64),
+            "adj_hours": (rng.random(n_rows) < 0.03).astype(np.float64),
+            "cloud_cover": rng.integers(0, 6, n_rows).astype(np.float64),
+            "rain_intensity": rng.choice(12, n_rows, p=[0.7] + [0.3 / 11] * 11).astype(np.float64),
+            "sleet_intensity": rng.choice(6, n_rows, p=[0.95] + [0.01] * 5).astype(np.float64),
+            "snow_intensity": rng.choice(10, n_rows, p=[0.91] + [0.01] * 9).astype(np.float64),
+            "ice_intensity": rng.choice(10, n_rows, p=[0.97] + [0.03 / 9] * 9).astype(np.float64),
+            "thunder_intensity": rng.choice(3, n_rows, p=[0.96, 0.02, 0.02]).astype(np.float64),
+        }
+    )
+    weights = np.array([0.4, -20.0, -6.0, -3.0, -0.3, -0.8, -1.0, -1.2, -1.5, -0.5])
+    expected = np.clip(8 + df[regressors].to_numpy() @ weights, 0.5, None)
+    df["car_count"] = rng.poisson(expected).astype(np.float64)
+    return df
+
+
+def run_strategy(data: pd.DataFrame, strategy: str, grid_size: int) -> dict:
+    m = ElasticNetModel(data, search_strategy=strategy)
+    m.grid_size = grid_size
+    m.cv_splits = cv_splits
+    m.cv_repeats = cv_repeats
+    m.max_iter = max_iter
+    np.random.seed(0)  # same cross validation folds for every strategy
+    start = time.perf_counter()
+    m.tune_model()
+    return {
+        "strategy": strategy,
+        "fits": m.n_fits,
+        "seconds": time.perf_counter() - start,
+        "mae": m.mae,
+        "l1_ratio": m.l1_ratio,
+        "alpha": m.alpha,
+    }
+
+
+def run(n_rows: int, grid_size: int) -> None:
+    data = create_region_df(n_rows, np.random.default_rng(0))
+    results = [
+        run_strategy(data, strategy, grid_size)
+        for strategy in search_strategies
+    ]
+
+    exhaustive = results[0]
+    print(f"{n_rows} rows, exhaustive grid {grid_size}x{grid_size}")
+    print(
+        f"{'strategy':>15} {'fits':>8} {'seconds':>9} {'mae':>9} "
+        f"{'mae vs grid':>12} {'l1_ratio':>9} {'alpha':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['strategy']:>15} {r['fits']:>8} {r['seconds']:>9.2f} {r['mae']:>9.4f} "
+            f"{(r['mae'] - exhaustive['mae']) / exhaustive['mae']:>+11.2%} "
+            f"{r['l1_ratio']:>9.3f} {r['alpha']:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else default_n_rows,
+        int(sys.argv[2]) if len(sys.argv) > 2 else default_grid_size,
+    )
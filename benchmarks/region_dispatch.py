@@ -0,0 +1,104 @@
+"""
+compares handing region data to Pool workers as pickled DataFrame slices (the
+original main.run) with handing them SharedDataset slices, reporting dispatch
+time and peak RSS of the parent and of the largest worker.
+
+each mode runs in its own interpreter so the peaks do not mix.
+
+run from the repository root:
+    python -m benchmarks.region_dispatch [n_rows] [n_regions]
+"""
+
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from elastic_net_model import regressors, predictor
+from shared_dataset import SharedDataset, DatasetSlice
+
+logging.disable(logging.INFO)
+
+default_n_rows = 4_000_000
+default_n_regions = 40
+n_workers = 6
+
+
+def create_store_data(n_rows: int, n_regions: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((n_rows, len(regressors + predictor))), columns=regressors + predictor)
+    df.insert(0, "region_number", rng.integers(0, n_regions, n_rows).astype(str))
+    return df
+
+
+def summarize_frame(region_number: str, data: pd.DataFrame) -> float:
+    return float(data[regressors].to_numpy().sum())
+
+
+def summarize_slice(region_number: str, data_slice: DatasetSlice) -> float:
+    return summarize_frame(region_number, data_slice.load())
+
+
+def run_mode(mode: str, n_rows: int, n_regions: int) -> dict:
+    store_data = create_store_data(n_rows, n_regions)
+    start = time.perf_counter()
+    if mode == "pickle":
+        items = [
+            (region_number, store_data.loc[store_data["region_number"] == region_number, regressors + predictor])
+            for region_number in store_data.region_number.unique()
+        ]
+        fn = summarize_frame
+    else:
+        dataset = SharedDataset(store_data, "region_number", regressors + predictor)
+        del store_data
+        items = [(region_number, dataset.slice(region_number)) for region_number in dataset.ranges]
+        fn = summarize_slice
+    prepared = time.perf_counter()
+
+    with Pool(n_workers) as pool:
+        pool.starmap(fn, items, chunksize=1)
+    finished = time.perf_counter()
+    if mode == "shared":
+        dataset.close()
+
+    return {
+        "mode": mode,
+        "prepare_seconds": prepared - start,
+        "dispatch_seconds": finished - prepared,
+        "parent_peak_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "worker_peak_mib": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def run(n_rows: int, n_regions: int) -> None:
+    print(f"{n_rows} rows across {n_regions} regions, {n_workers} workers")
+    print(f"{'mode':>8} {'prepare s':>10} {'dispatch s':>11} {'parent MiB':>11} {'worker MiB':>11}")
+    for mode in ["pickle", "shared"]:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.region_dispatch", "--mode", mode, str(n_rows), str(n_regions)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{r['mode']:>8} {r['prepare_seconds']:>10.2f} {r['dispatch_seconds']:>11.2f} "
+            f"{r['parent_peak_mib']:>11.0f} {r['worker_peak_mib']:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) > 1 and args[0] == "--mode":
+        print(json.dumps(run_mode(args[1], int(args[2]), int(args[3]))))
+    else:
+        run(
+            int(args[0]) if len(args) > 0 else default_n_rows,
+            int(args[1]) if len(args) > 1 else default_n_regions,
+        )
@@ -0,0 +1,98 @@
+"""
+compares the original grow-by-concat accumulation of per-store frames with
+main.assemble_store_frames for a fleet of stores, checking both build the same
+frame and reporting runtime and peak traced memory for each.
+
+run from the repository root:
+    python -m benchmarks.store_assembly [n_stores] [rows_per_store]
+"""
+
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from elastic_net_model import regressors, predictor
+from frame_schema import apply_schema, feature_dtypes, join_store_attributes
+from main import assemble_store_frames
+
+logging.disable(logging.INFO)
+
+default_n_stores = 2000
+default_rows_per_store = 250
+
+
+def legacy_assemble_store_frames(store_frames: list) -> pd.DataFrame:
+    all_data = pd.DataFrame([])
+    for _, store_info_df in store_frames:
+        if len(all_data.columns) == 0:
+            all_data = store_info_df.copy()
+        else:
+            all_data = pd.concat([all_data, store_info_df], ignore_index=True)
+    # same schema and store attribute join as assemble_store_frames, only the concat differs
+    apply_schema(all_data, feature_dtypes)
+    return join_store_attributes(
+        all_data,
+        pd.DataFrame([store for store, _ in store_frames]),
+        [frame.shape[0] for _, frame in store_frames],
+    )
+
+
+def create_store_frames(
+    n_stores: int, rows_per_store: int, rng: np.random.Generator
+) -> list:
+    store_frames = []
+    date_time = pd.date_range("2023-09-06", periods=rows_per_store, freq="h")
+    for i in range(n_stores):
+        store_info = pd.Series({
+            "region_number": str(i % 40),
+            "location_number": str(10000 + i),
+            "is_closed_sunday": bool(i % 2),
+            "summer_hours_open": 7,
+            "summer_hours_close": 19,
+            "winter_hours_open": 8,
+            "winter_hours_close": 18,
+            "time_zone": "America/Chicago",
+        })
+        df = pd.DataFrame({"date_time": date_time, "condition": "partly cloudy"})
+        for column in regressors + predictor:
+            df[column] = rng.integers(0, 10, rows_per_store)
+        store_frames.append((store_info, df))
+    return store_frames
+
+
+def measure(fn, store_frames: list) -> tuple[float, int, pd.DataFrame]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(store_frames)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def run(n_stores: int, rows_per_store: int) -> None:
+    store_frames = create_store_frames(n_stores, rows_per_store, np.random.default_rng(0))
+    print(f"{n_stores} stores x {rows_per_store} rows")
+
+    legacy_seconds, legacy_peak, legacy_df = measure(
+        legacy_assemble_store_frames, store_frames
+    )
+    seconds, peak, assembled_df = measure(assemble_store_frames, store_frames)
+    pd.testing.assert_frame_equal(legacy_df, assembled_df)
+
+    print(f"{'':>10} {'seconds':>10} {'peak MiB':>10}")
+    print(f"{'legacy':>10} {legacy_seconds:>10.3f} {legacy_peak / 2**20:>10.1f}")
+    print(f"{'single':>10} {seconds:>10.3f} {peak / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else default_n_stores,
+        int(sys.argv[2]) if len(sys.argv) > 2 else default_rows_per_store,
+    )
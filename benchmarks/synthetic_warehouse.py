@@ -0,0 +1,344 @@
+"""
+offline benchmark suite. SyntheticWarehouse stands in for RedshiftDW in process,
+serving generated zip codes, stores, daily weather and years of hourly orders
+with a simulated round trip latency, so get_store_data, cleaning, tune_model
+and the full run can be timed on a laptop with no network access.
+
+weather conditions are drawn from the weather_dictionaries vocabularies (with
+the stray capitals and whitespace the raw feed has), stores are spread over
+several time zones and order counts follow an hourly profile with weekly and
+seasonal swings.
+
+the model search runs with cut down cross validation and max_iter, like
+benchmarks.hyperparameter_search, so the full run finishes on a laptop.
+
+run from the repository root:
+    python -m benchmarks.synthetic_warehouse [fleet sizes ...]
+"""
+
+import datetime
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# the warehouse is never contacted, but Config insists on credentials
+for variable in ["DBHOST", "DBPORT", "DBNAME", "DBUSER", "DBPASSWORD", "WEATHERAPIKEY"]:
+    os.environ.setdefault(variable, "1" if variable == "DBPORT" else "synthetic")
+
+import main
+from config import Config
+from data_cleanup import clean_data, clean_weather, clean_store_data
+from data_warehouse import RedshiftDW, store_feature_columns
+from elastic_net_model import ElasticNetModel, regressors, predictor
+from weather_dictionaries import *
+
+logging.disable(logging.INFO)
+warnings.filterwarnings("ignore")
+
+default_fleet_sizes = [10, 40, 160]
+stores_per_zip = 2
+stores_per_region = 8
+latency_seconds = 0.02
+row_seconds = 2e-7
+time_zones = [
+    "America/New_York",
+    "America/Chicago",
+    "America/Denver",
+    "America/Phoenix",
+    "America/Los_Angeles",
+]
+cv_splits = 5
+cv_repeats = 1
+max_iter = 2000
+grid_size = 20
+# the grid and coarse_to_fine searches take minutes a region even cut down
+tune_strategies = ["path"]
+
+
+class SyntheticWarehouse(RedshiftDW):
+    """
+    RedshiftDW with every query answered from generated frames. the fetch
+    methods are replaced, so the caching, hourly expansion and partitioning of
+    the real class still run on top of them.
+    """
+
+    stores: pd.DataFrame
+    daily_weather: pd.DataFrame
+    orders: pd.DataFrame
+    written: list
+    features: pd.DataFrame
+
+    def round_trip(self, rows: int) -> None:
+        time.sleep(latency_seconds + rows * row_seconds)
+
+    def get_distinct_zip_codes_for_stores(self) -> pd.DataFrame:
+        zip_codes = pd.DataFrame({"zip_code": self.stores["zip_code"].unique()})
+        self.round_trip(zip_codes.shape[0])
+        return zip_codes
+
+    def fetch_stores_by_zip_code(self, zipcode: str) -> pd.DataFrame:
+        return self.fetch_stores_by_zip_codes([zipcode])[zipcode]
+
+    def fetch_stores_by_zip_codes(self, zipcodes: list) -> dict:
+        store_df = self.stores.loc[self.stores["zip_code"].isin(zipcodes)]
+        self.round_trip(store_df.shape[0])
+        return self.partition_rows(
+            store_df, "zip_code", zipcodes, list(self.stores.columns.drop("zip_code"))
+        )
+
+    def fetch_daily_weather_by_zip_code(
+        self, zipcode: str, since: datetime.date = None
+    ) -> pd.DataFrame:
+        return self.fetch_daily_weather_by_zip_codes([zipcode], since)[zipcode]
+
+    def fetch_daily_weather_by_zip_codes(
+        self, zipcodes: list, since: datetime.date = None
+    ) -> dict:
+        weather_df = self.daily_weather.loc[self.daily_weather["zip_code"].isin(zipcodes)]
+        if since is not None:
+            weather_df = weather_df.loc[weather_df["weather_date"] >= pd.Timestamp(since)]
+        self.round_trip(weather_df.shape[0])
+        return self.partition_rows(
+            weather_df,
+            "zip_code",
+            zipcodes,
+            ["weather_date", "condition_text", "total_precipitation"],
+        )
+
+    def fetch_orders_by_store_number(
+        self, store_number: str, since: datetime.date = None
+    ) -> pd.DataFrame:
+        return self.fetch_orders_by_store_numbers([store_number], since)[store_number]
+
+    def fetch_orders_by_store_numbers(
+        self, store_numbers: list, since: datetime.date = None
+    ) -> dict:
+        orders_df = self.orders.loc[self.orders["location_number"].isin(store_numbers)]
+        if since is not None:
+            orders_df = orders_df.loc[orders_df["date_time"] >= pd.Timestamp(since)]
+        self.round_trip(orders_df.shape[0])
+        return self.partition_rows(
+            orders_df, "location_number", store_numbers, ["date_time", "car_count"]
+        )
+
+    def fetch_store_features_by_store_numbers(self, store_numbers: list) -> dict:
+        # the cluster's share of warehouse feature mode is done here once with the
+        # local cleaning stages, later calls only pay for the transfer. this times
+        # the client side of the mode, it does not run the query
+        if self.features is None:
+            weather = self.get_historic_weather_by_zip_codes(list(self.stores["zip_code"].unique()))
+            orders = self.get_orders_by_store_numbers(list(self.stores["location_number"]))
+            frames = []
+            for zipcode, stores in self.stores.groupby("zip_code", sort=False):
+                clean_weather(weather[zipcode])
+                for _, store in stores.iterrows():
+                    data = clean_store_data(weather[zipcode], store, orders[store["location_number"]])
+                    data.insert(0, "location_number", store["location_number"])
+                    frames.append(data)
+            self.features = pd.concat(frames, ignore_index=True)
+        features_df = self.features.loc[self.features["location_number"].isin(store_numbers)]
+        self.round_trip(features_df.shape[0])
+        return self.partition_rows(
+            features_df, "location_number", store_numbers, store_feature_columns
+        )
+
+    def get_store_hyperparameters(self, store_numbers: list) -> dict:
+        self.round_trip(0)
+        return {}
+
+    def write_model_results(self, region_rows: list, store_rows: list) -> None:
+        self.round_trip(len(region_rows) + len(store_rows))
+        self.written.append((region_rows, store_rows))
+
+    def __init__(self, c: Config, n_stores: int, seed: int = 0):
+        super().__init__(c)
+        rng = np.random.default_rng(seed)
+        self.written = []
+        self.features = None
+
+        n_zips = math.ceil(n_stores / stores_per_zip)
+        zipcodes = [f"{10000 + 7 * i:05d}" for i in range(n_zips)]
+        zip_time_zones = rng.choice(time_zones, n_zips)
+        store_zips = np.repeat(np.arange(n_zips), stores_per_zip)[:n_stores]
+        opens = rng.integers(5, 9, n_stores)
+        self.stores = pd.DataFrame(
+            {
+                "region_number": [str(i // stores_per_region) for i in range(n_stores)],
+                "location_number": [str(20000 + i) for i in range(n_stores)],
+                "is_closed_sunday": rng.random(n_stores) < 0.3,
+                "summer_hours_open": opens,
+                "summer_hours_close": opens + rng.integers(10, 14, n_stores),
+                "winter_hours_open": opens + 1,
+                "winter_hours_close": opens + rng.integers(9, 13, n_stores),
+                "time_zone": zip_time_zones[store_zips],
+                "zip_code": [zipcodes[z] for z in store_zips],
+            }
+        )
+        self.daily_weather = self.create_daily_weather(zipcodes, rng)
+        self.orders = self.create_orders(rng)
+
+    def create_daily_weather(self, zipcodes: list, rng: np.random.Generator) -> pd.DataFrame:
+        start, end = self.get_datetimes_for_order_query()
+        days = pd.date_range(start, end, freq="D", inclusive="left")
+        # the raw feed is mostly clear or cloudy, with the odd capital or trailing space
+        clear = ["sunny", "clear"]
+        cloudy = list(cloud_enumeration_dict)
+        rest = list(
+            {
+                **rain_enumeration_dict,
+                **sleet_enumeration_dict,
+                **snow_enumeration_dict,
+                **ice_enumeration_dict,
+                **thunder_enumeration_dict,
+            }
+        )
+        vocabulary = clear + cloudy + rest
+        weights = np.array([20.0] * len(clear) + [8.0] * len(cloudy) + [1.0] * len(rest))
+        n_rows = len(zipcodes) * len(days)
+        conditions = rng.choice(vocabulary, n_rows, p=weights / weights.sum()).astype(object)
+        messy = rng.random(n_rows) < 0.1
+        conditions[messy] = [f"{c.capitalize()} " for c in conditions[messy]]
+        precipitation = rng.gamma(0.3, 0.3, n_rows).astype(object)
+        precipitation[rng.random(n_rows) < 0.05] = None
+        return pd.DataFrame(
+            {
+                "zip_code": np.repeat(zipcodes, len(days)),
+                "weather_date": np.tile(days, len(zipcodes)),
+                "condition_text": conditions,
+                "total_precipitation": precipitation,
+            }
+        )
+
+    def create_orders(self, rng: np.random.Generator) -> pd.DataFrame:
+        start, end = self.get_datetimes_for_order_query()
+        hours = pd.date_range(start, end, freq="h", inclusive="left")
+        hour_of_day = hours.hour.to_numpy()
+        # lunch and after work peaks, busier weekends and summers
+        profile = (
+            2
+            + 6 * np.exp(-((hour_of_day - 12) ** 2) / 6)
+            + 5 * np.exp(-((hour_of_day - 17) ** 2) / 4)
+        ) * np.where(hours.dayofweek.to_numpy() >= 5, 1.3, 1.0) * (
+            1 + 0.2 * np.sin(2 * np.pi * (hours.dayofyear.to_numpy() - 100) / 365)
+        )
+        frames = []
+        for location_number in self.stores["location_number"]:
+            counts = rng.poisson(profile * rng.uniform(0.5, 1.5))
+            ordered = counts > 0
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "location_number": location_number,
+                        "date_time": hours[ordered],
+                        "car_count": counts[ordered],
+                    }
+                )
+            )
+        return pd.concat(frames, ignore_index=True)
+
+
+def create_config(extract_mode: str = "bulk", extract_concurrency: int = 0) -> Config:
+    config = Config()
+    config.db_pool_size = 0
+    config.cache_dir = None
+    config.extract_mode = extract_mode
+    config.extract_concurrency = extract_concurrency
+    config.en_search_strategy = "path"
+    config.fit_mode = "region"
+    config.fingerprint_file = None
+    config.run_report_file = None
+    return config
+
+
+def time_call(fn, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def run_fleet(n_stores: int) -> list:
+    timings = []
+    config = create_config()
+    dw = SyntheticWarehouse(config, n_stores)
+    for extract_mode, concurrency in [("per_key", 0), ("bulk", 0), ("bulk", 4)]:
+        seconds, store_data = time_call(
+            main.get_store_data, dw, extract_mode, concurrency, config.extract_queue_size
+        )
+        timings.append((f"get_store_data {extract_mode} x{concurrency}", seconds))
+    # builds the stand-in's features outside the timing, the cluster would do that work
+    dw.fetch_store_features_by_store_numbers([])
+    seconds, _ = time_call(
+        main.get_store_data, dw, "bulk", 0, config.extract_queue_size, "warehouse"
+    )
+    timings.append(("get_store_data warehouse features", seconds))
+
+    # cleaning on its own: clean_data on every store's merged copy of its zip's
+    # weather, against the weather stage once per zip and the store stage per store
+    items = main.fetch_zip_batch(dw, list(dw.stores["zip_code"].unique()))
+    frames = []
+    for weather, stores, orders in items:
+        for _, store in stores.iterrows():
+            data = pd.merge(weather, orders[store["location_number"]], how="left", on="date_time")
+            for column, value in store.items():
+                data[column] = value
+            frames.append(data)
+    n_rows = sum(data.shape[0] for data in frames)
+    seconds, _ = time_call(lambda: [clean_data(data) for data in frames])
+    timings.append((f"clean_data per store ({n_rows} rows)", seconds))
+
+    def clean_by_zip():
+        for weather, stores, orders in items:
+            clean_weather(weather)
+            for _, store in stores.iterrows():
+                clean_store_data(weather, store, orders[store["location_number"]])
+
+    seconds, _ = time_call(clean_by_zip)
+    timings.append(("clean_weather + clean_store_data", seconds))
+
+    region_number = store_data["region_number"].value_counts().index[0]
+    region = store_data.loc[store_data["region_number"] == region_number, regressors + predictor]
+    for strategy in tune_strategies:
+        m = ElasticNetModel(region, search_strategy=strategy, n_jobs=1)
+        np.random.seed(0)
+        seconds, _ = time_call(m.tune_model)
+        timings.append((f"tune_model {strategy} ({region.shape[0]} rows)", seconds))
+
+    # the full run, with main building the synthetic warehouse instead of RedshiftDW
+    real_warehouse, real_config = main.RedshiftDW, main.Config
+    main.RedshiftDW = lambda c: SyntheticWarehouse(c, n_stores)
+    main.Config = lambda: create_config("bulk", 4)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        for images in ["vals", "paths"]:
+            os.makedirs(os.path.join(directory, "images", images))
+        os.chdir(directory)
+        try:
+            seconds, _ = time_call(main.run)
+        finally:
+            os.chdir(cwd)
+            main.RedshiftDW, main.Config = real_warehouse, real_config
+    timings.append(("run (incl. data generation)", seconds))
+    return timings
+
+
+def run(fleet_sizes: list) -> None:
+    ElasticNetModel.cv_splits = cv_splits
+    ElasticNetModel.cv_repeats = cv_repeats
+    ElasticNetModel.max_iter = max_iter
+    ElasticNetModel.grid_size = grid_size
+
+    for n_stores in fleet_sizes:
+        print(f"{n_stores} stores")
+        for name, seconds in run_fleet(n_stores):
+            print(f"    {name:<40} {seconds:>8.2f} s")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or default_fleet_sizes)
@@ -0,0 +1,112 @@
+import datetime
+import functools
+
+import numpy as np
+import pandas as pd
+import pytz
+
+"""
+daylight saving time only depends on the time zone and the date, and a store's
+open hours only on its hours profile. the business hours of a year are built
+once per time zone, year and profile, as one flag per local hour, and every
+store sharing them looks its rows up in that array.
+"""
+
+# a year of flags is under 9kB, so a few hundred profiles stay small
+business_calendar_cache_size = 512
+
+
+def is_dst(year: int, month: int, day: int, tz: str) -> bool:
+    # from gist https://gist.github.com/dpapathanasiou/09bd2885813038d7d3eb
+    non_dst = datetime.datetime(year=year, month=1, day=1)
+    non_dst_tz_aware = pytz.timezone(tz).localize(non_dst)
+    return not (
+        non_dst_tz_aware.utcoffset()
+        == pytz.timezone(tz)
+        .localize(datetime.datetime(year=year, month=month, day=day))
+        .utcoffset()
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def dst_transition_dates(tz: str, year: int) -> tuple:
+    """
+    first date in the year whose midnight is on daylight saving time and the
+    first date after it back on standard time, matching is_dst day by day.
+    (None, None) for time zones without daylight saving time.
+    """
+    dst_start = None
+    date = datetime.date(year=year, month=1, day=1)
+    while date.year == year:
+        dst = is_dst(date.year, date.month, date.day, tz)
+        if dst and dst_start is None:
+            dst_start = date
+        elif not dst and dst_start is not None:
+            return dst_start, date
+        date += datetime.timedelta(days=1)
+
+    if dst_start is None:
+        return None, None
+    return dst_start, datetime.date(year=year + 1, month=1, day=1)
+
+
+@functools.lru_cache(maxsize=business_calendar_cache_size)
+def business_hours_calendar(
+    tz: str,
+    year: int,
+    summer_open: int,
+    summer_close: int,
+    winter_open: int,
+    winter_close: int,
+    is_closed_sunday: bool,
+) -> np.ndarray:
+    """
+    one flag per local hour of the year, hour 0 being midnight of january 1st,
+    true while a store with this profile is open. read only, it is shared.
+    """
+    hours = pd.date_range(
+        datetime.datetime(year=year, month=1, day=1),
+        datetime.datetime(year=year + 1, month=1, day=1),
+        freq="h",
+        inclusive="left",
+    )
+    dates = hours.normalize()
+    dst = np.zeros(len(hours), dtype=bool)
+    dst_start, dst_end = dst_transition_dates(tz, year)
+    if dst_start is not None:
+        dst = (dates >= pd.Timestamp(dst_start)) & (dates < pd.Timestamp(dst_end))
+
+    hour = hours.hour.to_numpy()
+    open_hours = np.where(dst, summer_open, winter_open)
+    close_hours = np.where(dst, summer_close, winter_close)
+    closed_sunday = is_closed_sunday & (hours.dayofweek == 6)
+
+    calendar = ~closed_sunday & (hour >= open_hours) & (hour < close_hours)
+    calendar.flags.writeable = False
+    return calendar
+
+
+def business_hour_mask(date_times: pd.Series, store) -> np.ndarray:
+    """
+    store is anything indexed by the store parameter names, a store row or the
+    first row of a frame carrying them
+    """
+    profile = (
+        int(store["summer_hours_open"]),
+        int(store["summer_hours_close"]),
+        int(store["winter_hours_open"]),
+        int(store["winter_hours_close"]),
+        bool(store["is_closed_sunday"]),
+    )
+    values = date_times.to_numpy(dtype="datetime64[ns]")
+    years = values.astype("datetime64[Y]")
+    hour_of_year = (values - years) // np.timedelta64(1, "h")
+
+    mask = np.zeros(len(values), dtype=bool)
+    for year in np.unique(years):
+        in_year = years == year
+        calendar = business_hours_calendar(
+            store["time_zone"], int(str(year)), *profile
+        )
+        mask[in_year] = calendar[hour_of_year[in_year]]
+    return mask
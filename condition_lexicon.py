@@ -0,0 +1,193 @@
+import logging
+import sys
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from error_types import ConfigError
+from error_strings import *
+from weather_dictionaries import *
+
+log = logging.getLogger(__name__)
+
+weather_condition_columns = [
+    "cloud_cover",
+    "rain_intensity",
+    "sleet_intensity",
+    "snow_intensity",
+    "ice_intensity",
+    "thunder_intensity",
+]
+
+# reported every clear hour, known to the lexicon with every intensity at zero
+clear_conditions = ["sunny", "clear"]
+
+# how many unseen conditions report() names
+reported_unseen_conditions = 10
+
+# every character str.strip() removes, for sql normalizing conditions the same way
+condition_whitespace = "".join(
+    c for c in map(chr, range(sys.maxunicode + 1)) if c.isspace()
+)
+
+
+def normalize_condition(condition):
+    if type(condition) == float:
+        return condition
+    return condition.strip().lower()
+
+
+def create_vocabulary_from_dictionaries() -> pd.DataFrame:
+    """
+    one row per known condition string, one column per intensity, zero where a
+    condition does not contribute to that intensity
+    """
+    vocabulary = pd.DataFrame(
+        {
+            "cloud_cover": cloud_enumeration_dict,
+            "rain_intensity": rain_enumeration_dict,
+            "sleet_intensity": sleet_enumeration_dict,
+            "snow_intensity": snow_enumeration_dict,
+            "ice_intensity": ice_enumeration_dict,
+            "thunder_intensity": thunder_enumeration_dict,
+        },
+        columns=weather_condition_columns,
+    )
+    return vocabulary.reindex(vocabulary.index.append(pd.Index(clear_conditions)))
+
+
+class ConditionLexicon:
+    """
+    compiled condition vocabulary: an integer code per normalized condition
+    string and an int8 table of the six intensities per code.
+
+    encode works on the distinct strings of a column and broadcasts back
+    through their codes. strings the vocabulary does not know are given a code
+    of their own with every intensity at zero, as they always were, and counted
+    in unseen so vocabulary drift shows up in the logs. missing conditions are
+    code -1, which the trailing row of the tables maps to nan and zeros.
+    """
+
+    source: str
+    codes: dict
+    conditions: list
+    table: np.ndarray
+    known: int
+    unseen: Counter
+
+    def encode(self, conditions) -> np.ndarray:
+        categorical = pd.Categorical(conditions)
+        normalized = categorical.categories.map(normalize_condition)
+        with self._lock:
+            new = [c for c in dict.fromkeys(normalized) if c not in self.codes]
+            if len(new) > 0:
+                self.add_unseen(new)
+            category_codes = np.array([self.codes[c] for c in normalized], dtype=np.int32)
+
+            rows_per_category = np.bincount(
+                categorical.codes[categorical.codes >= 0],
+                minlength=len(normalized),
+            )
+            for condition, code, rows in zip(normalized, category_codes, rows_per_category):
+                if code >= self.known and rows > 0:
+                    self.unseen[condition] += int(rows)
+
+        # the trailing -1 keeps missing conditions missing
+        return np.append(category_codes, -1)[categorical.codes]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.array(self.conditions + [np.nan], dtype=object)[codes]
+
+    def intensities(self, codes: np.ndarray) -> np.ndarray:
+        return self.table[codes]
+
+    def add_unseen(self, conditions: list) -> None:
+        for condition in conditions:
+            self.codes[condition] = len(self.conditions)
+            self.conditions.append(condition)
+        self.table = np.insert(
+            self.table,
+            self.table.shape[0] - 1,
+            np.zeros((len(conditions), len(weather_condition_columns)), dtype=np.int8),
+            axis=0,
+        )
+
+    def compile(self, vocabulary: pd.DataFrame, source: str) -> None:
+        vocabulary = vocabulary.reindex(columns=weather_condition_columns).fillna(0)
+        vocabulary.index = vocabulary.index.map(normalize_condition)
+        # a condition listed twice keeps the strongest intensities of its rows
+        vocabulary = vocabulary.groupby(level=0, sort=False).max()
+        with self._lock:
+            self.source = source
+            self.codes = {condition: code for code, condition in enumerate(vocabulary.index)}
+            self.conditions = list(vocabulary.index)
+            self.table = np.vstack(
+                [
+                    vocabulary.to_numpy(dtype=np.int8),
+                    np.zeros((1, len(weather_condition_columns)), dtype=np.int8),
+                ]
+            )
+            self.known = len(self.conditions)
+            self.unseen = Counter()
+        log.info(f"compiled {self.known} weather conditions from {source}")
+
+    def load(self, path: str) -> None:
+        """
+        reads the vocabulary from a csv file with a condition column and a column
+        per intensity, intensities a condition does not have may be left empty
+        """
+        try:
+            vocabulary = pd.read_csv(path, index_col="condition", dtype={"condition": str})
+            unknown_columns = set(vocabulary.columns) - set(weather_condition_columns)
+            if len(unknown_columns) > 0:
+                raise ValueError(f"unknown intensity columns {sorted(unknown_columns)}")
+            values = vocabulary.fillna(0).to_numpy(dtype=np.int64)
+            if vocabulary.index.isna().any() or (values < 0).any() or (values > 127).any():
+                raise ValueError("conditions must be named, intensities between 0 and 127")
+        except Exception as e:
+            log.error(invalid_condition_lexicon)
+            raise ConfigError(
+                data={"condition_lexicon_file": path, "err": e},
+                message=invalid_condition_lexicon,
+            )
+        self.compile(vocabulary, path)
+
+    def vocabulary(self) -> pd.DataFrame:
+        """
+        the known conditions and their intensities, without unseen ones
+        """
+        with self._lock:
+            return pd.DataFrame(
+                self.table[: self.known],
+                index=pd.Index(self.conditions[: self.known], name="condition"),
+                columns=weather_condition_columns,
+            )
+
+    def save(self, path: str) -> None:
+        """
+        writes the known vocabulary in the format load reads, a starting point
+        for a lexicon file
+        """
+        self.vocabulary().to_csv(path)
+
+    def report(self) -> dict:
+        with self._lock:
+            unseen = dict(self.unseen.most_common(reported_unseen_conditions))
+            unseen_rows = sum(self.unseen.values())
+            distinct = len(self.unseen)
+        if distinct > 0:
+            log.warning(
+                f"{distinct} weather conditions unknown to the lexicon from {self.source} "
+                f"on {unseen_rows} hourly rows, encoded with zero intensities: {unseen}"
+            )
+        return unseen
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compile(create_vocabulary_from_dictionaries(), "weather_dictionaries")
+
+
+# one per process, built at import and replaced from a file by main.run
+lexicon = ConditionLexicon()
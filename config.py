@@ -3,9 +3,14 @@ import os
 
 from error_types import ConfigError
 from error_strings import *
+from elastic_net_model import search_strategies
 
 log = logging.getLogger(__name__)
 
+extract_modes = ["bulk", "per_key"]
+fit_modes = ["region", "store"]
+feature_modes = ["local", "warehouse"]
+
 
 class Config:
     """
@@ -19,6 +24,60 @@ class Config:
     db_port: int
     db_password: str
 
+    """
+    connection pool configs
+    """
+    db_pool_size: int
+    db_pool_health_check_seconds: float
+    db_pool_timeout_seconds: float
+    db_fetch_batch_size: int
+    db_prepare_statements: bool
+
+    """
+    extraction configs
+    """
+    extract_mode: str
+    extract_concurrency: int
+    extract_queue_size: int
+    cache_dir: str
+    cache_store_max_age_hours: float
+
+    """
+    model tuning configs
+    """
+    en_search_strategy: str
+    en_mae_tolerance: float
+
+    """
+    fit mode configs
+    """
+    fit_mode: str
+    store_search_strategy: str
+    store_batch_rows: int
+    checkpoint_file: str
+    fingerprint_file: str
+
+    """
+    feature configs
+    """
+    feature_mode: str
+    condition_lexicon_file: str
+
+    """
+    parallelism configs
+    """
+    cpu_budget: int
+    region_workers: int
+    cv_jobs: int
+    shared_data_dir: str
+
+    """
+    instrumentation configs
+    """
+    run_report_file: str
+    profile_memory: bool
+    profile_dir: str
+
     """
     weather configs
     """
@@ -95,12 +154,230 @@ class Config:
         self.db_password = os.environ.get("DBPASSWORD")
         log.info("database password set in config")
 
+    def get_connection_pool_configs_from_environment(self) -> None:
+        log.info("getting connection pool settings from environment")
+        try:
+            self.db_pool_size = int(os.environ.get("DBPOOLSIZE", 4))
+            self.db_pool_health_check_seconds = float(
+                os.environ.get("DBPOOLHEALTHCHECKSECONDS", 60)
+            )
+            self.db_pool_timeout_seconds = float(
+                os.environ.get("DBPOOLTIMEOUTSECONDS", 30)
+            )
+            # 0 turns streaming off and fetches every result in one go
+            self.db_fetch_batch_size = int(os.environ.get("DBFETCHBATCHSIZE", 10000))
+        except ValueError:
+            log.error(invalid_db_pool_setting)
+            raise ConfigError(
+                data={
+                    "db_pool_size": os.environ.get("DBPOOLSIZE", None),
+                    "db_pool_health_check_seconds": os.environ.get(
+                        "DBPOOLHEALTHCHECKSECONDS", None
+                    ),
+                    "db_pool_timeout_seconds": os.environ.get(
+                        "DBPOOLTIMEOUTSECONDS", None
+                    ),
+                    "db_fetch_batch_size": os.environ.get("DBFETCHBATCHSIZE", None),
+                },
+                message=invalid_db_pool_setting,
+            )
+
+        if (
+            self.db_pool_size < 0
+            or self.db_pool_health_check_seconds < 0
+            or self.db_pool_timeout_seconds < 0
+            or self.db_fetch_batch_size < 0
+        ):
+            log.error(invalid_db_pool_setting)
+            raise ConfigError(
+                data={
+                    "db_pool_size": self.db_pool_size,
+                    "db_pool_health_check_seconds": self.db_pool_health_check_seconds,
+                    "db_pool_timeout_seconds": self.db_pool_timeout_seconds,
+                    "db_fetch_batch_size": self.db_fetch_batch_size,
+                },
+                message=invalid_db_pool_setting,
+            )
+        # statement poolers that hand sessions between clients break prepared statements
+        self.db_prepare_statements = (
+            os.environ.get("DBPREPARESTATEMENTS", "true").lower() == "true"
+        )
+        log.info(f"connection pool size set to {self.db_pool_size} in config")
+
+    def get_extract_configs_from_environment(self) -> None:
+        log.info("getting extraction settings from environment")
+        self.extract_mode = os.environ.get("EXTRACTMODE", "bulk").lower()
+        if self.extract_mode not in extract_modes:
+            log.error(invalid_extract_mode)
+            raise ConfigError(
+                data={"extract_mode": self.extract_mode},
+                message=invalid_extract_mode,
+            )
+        log.info(f"extract mode set to {self.extract_mode} in config")
+
+        try:
+            # 0 fetches and cleans serially on the calling thread
+            self.extract_concurrency = int(os.environ.get("EXTRACTCONCURRENCY", 4))
+            self.extract_queue_size = int(os.environ.get("EXTRACTQUEUESIZE", 8))
+        except ValueError:
+            self.extract_concurrency = -1
+        if self.extract_concurrency < 0 or self.extract_queue_size < 1:
+            log.error(invalid_extract_concurrency)
+            raise ConfigError(
+                data={
+                    "extract_concurrency": os.environ.get("EXTRACTCONCURRENCY", None),
+                    "extract_queue_size": os.environ.get("EXTRACTQUEUESIZE", None),
+                },
+                message=invalid_extract_concurrency,
+            )
+        log.info(
+            f"extract concurrency set to {self.extract_concurrency} with a queue of "
+            f"{self.extract_queue_size} in config"
+        )
+
+        # unset disables the local extract cache
+        self.cache_dir = os.environ.get("CACHEDIR", None)
+        try:
+            self.cache_store_max_age_hours = float(
+                os.environ.get("CACHESTOREMAXAGEHOURS", 24)
+            )
+        except ValueError:
+            log.error(invalid_cache_store_max_age)
+            raise ConfigError(
+                data={
+                    "cache_store_max_age_hours": os.environ.get(
+                        "CACHESTOREMAXAGEHOURS", None
+                    )
+                },
+                message=invalid_cache_store_max_age,
+            )
+        log.info(f"extract cache directory set to {self.cache_dir} in config")
+
+    def get_model_tuning_configs_from_environment(self) -> None:
+        log.info("getting model tuning settings from environment")
+        self.en_search_strategy = os.environ.get("ENSEARCHSTRATEGY", "grid").lower()
+        if self.en_search_strategy not in search_strategies:
+            log.error(invalid_search_strategy)
+            raise ConfigError(
+                data={
+                    "en_search_strategy": self.en_search_strategy,
+                    "supported_strategies": search_strategies,
+                },
+                message=invalid_search_strategy,
+            )
+
+        try:
+            self.en_mae_tolerance = float(os.environ.get("ENMAETOLERANCE", 0.01))
+        except ValueError:
+            self.en_mae_tolerance = -1
+        if self.en_mae_tolerance < 0:
+            log.error(invalid_mae_tolerance)
+            raise ConfigError(
+                data={"en_mae_tolerance": os.environ.get("ENMAETOLERANCE", None)},
+                message=invalid_mae_tolerance,
+            )
+        log.info(f"search strategy set to {self.en_search_strategy} in config")
+
+    def get_fit_mode_configs_from_environment(self) -> None:
+        log.info("getting fit mode settings from environment")
+        self.fit_mode = os.environ.get("FITMODE", "region").lower()
+        if self.fit_mode not in fit_modes:
+            log.error(invalid_fit_mode)
+            raise ConfigError(
+                data={"fit_mode": self.fit_mode},
+                message=invalid_fit_mode,
+            )
+
+        # stores are fit by the thousand, so they default to the cheapest search
+        self.store_search_strategy = os.environ.get("STORESEARCHSTRATEGY", "path").lower()
+        if self.store_search_strategy not in search_strategies:
+            log.error(invalid_search_strategy)
+            raise ConfigError(
+                data={
+                    "store_search_strategy": self.store_search_strategy,
+                    "supported_strategies": search_strategies,
+                },
+                message=invalid_search_strategy,
+            )
+
+        try:
+            self.store_batch_rows = int(os.environ.get("STOREBATCHROWS", 200000))
+        except ValueError:
+            self.store_batch_rows = 0
+        if self.store_batch_rows <= 0:
+            log.error(invalid_store_batch_rows)
+            raise ConfigError(
+                data={"store_batch_rows": os.environ.get("STOREBATCHROWS", None)},
+                message=invalid_store_batch_rows,
+            )
+
+        # unset disables checkpointing, a crashed run then starts over
+        self.checkpoint_file = os.environ.get("CHECKPOINTFILE", None)
+        # unset disables incremental retraining, every model is fit from scratch
+        self.fingerprint_file = os.environ.get("FINGERPRINTFILE", None)
+        log.info(f"fit mode set to {self.fit_mode} in config")
+
+    def get_feature_configs_from_environment(self) -> None:
+        log.info("getting feature settings from environment")
+        # warehouse builds the model ready rows in redshift instead of in pandas
+        self.feature_mode = os.environ.get("FEATUREMODE", "local").lower()
+        if self.feature_mode not in feature_modes:
+            log.error(invalid_feature_mode)
+            raise ConfigError(
+                data={"feature_mode": self.feature_mode},
+                message=invalid_feature_mode,
+            )
+        log.info(f"feature mode set to {self.feature_mode} in config")
+
+        # unset compiles the lexicon from weather_dictionaries
+        self.condition_lexicon_file = os.environ.get("CONDITIONLEXICON", None)
+        log.info(f"condition lexicon file set to {self.condition_lexicon_file} in config")
+
+    def get_parallelism_configs_from_environment(self) -> None:
+        log.info("getting parallelism settings from environment")
+        try:
+            self.cpu_budget = int(os.environ.get("CPUBUDGET", os.cpu_count()))
+            self.region_workers = int(os.environ.get("REGIONWORKERS", 6))
+            self.cv_jobs = int(os.environ.get("CVJOBS", 0))
+        except ValueError:
+            self.cpu_budget = 0
+        if self.cpu_budget <= 0 or self.region_workers <= 0:
+            log.error(invalid_cpu_budget)
+            raise ConfigError(
+                data={
+                    "cpu_budget": os.environ.get("CPUBUDGET", None),
+                    "region_workers": os.environ.get("REGIONWORKERS", None),
+                    "cv_jobs": os.environ.get("CVJOBS", None),
+                },
+                message=invalid_cpu_budget,
+            )
+        log.info(f"cpu budget set to {self.cpu_budget} in config")
+
+        # unset uses the system temp directory, /dev/shm keeps the dataset in memory
+        self.shared_data_dir = os.environ.get("SHAREDDATADIR", None)
+
+    def get_instrumentation_configs_from_environment(self) -> None:
+        log.info("getting instrumentation settings from environment")
+        # unset disables instrumentation
+        self.run_report_file = os.environ.get("RUNREPORTFILE", None)
+        # tracing allocations slows every stage down, so it is opt in
+        self.profile_memory = os.environ.get("PROFILEMEMORY", "false").lower() == "true"
+        self.profile_dir = os.environ.get("PROFILEDIR", None)
+        log.info(f"run report file set to {self.run_report_file} in config")
+
     def __init__(self):
         log.info("creating config object")
 
         for func in [
             self.get_weatherapi_key_from_environment,
             self.get_database_configs_from_environment,
+            self.get_connection_pool_configs_from_environment,
+            self.get_extract_configs_from_environment,
+            self.get_model_tuning_configs_from_environment,
+            self.get_fit_mode_configs_from_environment,
+            self.get_feature_configs_from_environment,
+            self.get_parallelism_configs_from_environment,
+            self.get_instrumentation_configs_from_environment,
         ]:
             func()
 
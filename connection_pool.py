@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+import psycopg2
+
+from error_strings import *
+from error_types import ConnectionError
+from query_strings import health_check
+
+log = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    bounded pool of data warehouse connections. connections are opened lazily
+    up to max_size, handed out by checkout() and handed back by checkin().
+
+    a pool belongs to the process that created it. after a fork the child must
+    build its own pool instead of sharing the parent's sockets, so callers check
+    `pid` before reusing a pool.
+    """
+
+    max_size: int
+    health_check_interval: float
+    checkout_timeout: float
+    pid: int
+
+    def checkout(self) -> psycopg2.extensions.connection:
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            log.error(connection_pool_exhausted)
+            raise ConnectionError(
+                data={
+                    "pool-max-size": self.max_size,
+                    "checkout-timeout": self.checkout_timeout,
+                },
+                message=connection_pool_exhausted,
+            )
+
+        try:
+            return self._get_healthy_connection()
+        except:
+            self._slots.release()
+            raise
+
+    def checkin(self, conn: psycopg2.extensions.connection) -> None:
+        try:
+            if self._closed or conn.closed:
+                self._discard(conn)
+                return
+
+            try:
+                if (
+                    conn.get_transaction_status()
+                    != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                ):
+                    conn.rollback()
+            except psycopg2.Error:
+                log.warning("unable to reset pooled connection, discarding it")
+                self._discard(conn)
+                return
+
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self) -> None:
+        log.info("closing all idle pooled connections")
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _get_healthy_connection(self) -> psycopg2.extensions.connection:
+        while True:
+            with self._lock:
+                if len(self._idle) == 0:
+                    break
+                conn, last_used = self._idle.pop()
+
+            if self._is_healthy(conn, last_used):
+                return conn
+            log.warning("pooled connection failed its health check, discarding it")
+            self._discard(conn)
+
+        return self._connect_fn()
+
+    def _is_healthy(self, conn: psycopg2.extensions.connection, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(health_check)
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _discard(self, conn: psycopg2.extensions.connection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def __init__(
+        self,
+        connect_fn: Callable[[], psycopg2.extensions.connection],
+        max_size: int,
+        health_check_interval: float,
+        checkout_timeout: float,
+    ):
+        self._connect_fn = connect_fn
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.pid = os.getpid()
+
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
@@ -1,76 +1,21 @@
 import numpy as np
 import pandas as pd
-import datetime
-import pytz
 
-from weather_dictionaries import *
+from business_calendar import business_hour_mask
+from condition_lexicon import lexicon, weather_condition_columns
+from instrumentation import instruments
 
 """
 START WEATHER FUNCTIONS
 """
 
 
-def enumerate_weather(df: pd.DataFrame):
-    for enum_fn in [
-        clean_condition_strings,
-        create_weather_condition_columns,
-        enumerate_cloud,
-        enumerate_rain,
-        enumerate_sleet,
-        enumerate_snow,
-        enumerate_ice,
-        enumerate_thunder,
-    ]:
-        enum_fn(df)
-
-
-def enumerate_cloud(df: pd.DataFrame):
-    for key in cloud_enumeration_dict.keys():
-        df.loc[df["condition"] == key, "cloud_cover"] = cloud_enumeration_dict[key]
-
-
-def enumerate_rain(df: pd.DataFrame) -> None:
-    for key in rain_enumeration_dict.keys():
-        df.loc[df["condition"] == key, "rain_intensity"] = rain_enumeration_dict[key]
-
-
-def enumerate_sleet(df: pd.DataFrame) -> None:
-    for key in sleet_enumeration_dict.keys():
-        df.loc[df["condition"] == key, "sleet_intensity"] = sleet_enumeration_dict[key]
-
-
-def enumerate_snow(df: pd.DataFrame) -> None:
-    for key in snow_enumeration_dict.keys():
-        df.loc[df["condition"] == key, "snow_intensity"] = snow_enumeration_dict[key]
-
-
-def enumerate_ice(df: pd.DataFrame) -> None:
-    for key in ice_enumeration_dict.keys():
-        df.loc[df["condition"] == key, "ice_intensity"] = ice_enumeration_dict[key]
-
-
-def enumerate_thunder(df: pd.DataFrame) -> None:
-    for key in thunder_enumeration_dict.keys():
-        df.loc[df["condition"] == key, "thunder_intensity"] = thunder_enumeration_dict[
-            key
-        ]
-
-
-def create_weather_condition_columns(df: pd.DataFrame) -> None:
-    n = df.shape[0]
-    df.insert(len(df.columns), "cloud_cover", np.zeros(n))
-    df.insert(len(df.columns), "rain_intensity", np.zeros(n))
-    df.insert(len(df.columns), "sleet_intensity", np.zeros(n))
-    df.insert(len(df.columns), "snow_intensity", np.zeros(n))
-    df.insert(len(df.columns), "ice_intensity", np.zeros(n))
-    df.insert(len(df.columns), "thunder_intensity", np.zeros(n))
-
-
-def clean_condition_strings(df: pd.DataFrame) -> None:
-    for condition in df.condition.unique():
-        if type(condition) == float:
-            continue
-        df.loc[df["condition"] == condition, "condition"] = condition.strip().lower()
+def enumerate_weather(df: pd.DataFrame) -> None:
+    codes = lexicon.encode(df["condition"])
+    intensities = lexicon.intensities(codes)
+    df["condition"] = lexicon.decode(codes)
+    for i, column in enumerate(weather_condition_columns):
+        df.insert(len(df.columns), column, intensities[:, i])
 
 
 """
@@ -81,15 +26,12 @@ END WEATHER FUNCTIONS
 BEGIN DATETIME FUNCTIONS
 """
 
-def add_hour_column(df: pd.DataFrame) -> None:
-    n = df.shape[0]
-    df.insert(len(df.columns), "hour", np.zeros(n))
-
-
 def add_and_modify_hour_column(df: pd.DataFrame) -> None:
-    add_hour_column(df)
-    for i, date in enumerate(df["date_time"]):
-        df.loc[i, "hour"] = date.hour
+    # date_time is normally datetime64 already, cache=False skips the scan
+    # to_datetime does to decide whether caching would pay off
+    hours = pd.to_datetime(df["date_time"], cache=False).dt.hour
+    df.insert(len(df.columns), "hour", hours.to_numpy(dtype=np.int8))
+
 
 def create_holiday_array() -> list:
     return pd.to_datetime(
@@ -126,56 +68,34 @@ def create_adj_hours_array() -> list:
     )
 
 
-def create_holiday_condition_columns(df: pd.DataFrame) -> None:
-    n = df.shape[0]
-    df.insert(len(df.columns), "is_holiday", np.zeros(n))
-    df.insert(len(df.columns), "adj_hours", np.zeros(n))
+# built once at import, every store checks its dates against the same sets
+holiday_dates = create_holiday_array()
+adj_hours_dates = create_adj_hours_array()
 
 
 def add_and_modify_holiday_fields(df: pd.DataFrame) -> None:
-    create_holiday_condition_columns(df)
-    holidays = create_holiday_array()
-    adj_hours = create_adj_hours_array()
-
-    for i, date in enumerate(df["date_time"]):
-        if date != None:
-            continue
-        else:    
-            date = date.strftime("%Y-%m-%d")
-        if date in holidays:
-            df.loc[i, "is_holiday"] = 1
-        if date in adj_hours:
-            df.loc[i, "adj_hours"] = 1
-
-
-def is_dst(year: int, month: int, day: int, tz: str) -> bool:
-    # from gist https://gist.github.com/dpapathanasiou/09bd2885813038d7d3eb
-    non_dst = datetime.datetime(year=year, month=1, day=1)
-    non_dst_tz_aware = pytz.timezone(tz).localize(non_dst)
-    return not (
-        non_dst_tz_aware.utcoffset()
-        == pytz.timezone(tz)
-        .localize(datetime.datetime(year=year, month=month, day=day))
-        .utcoffset()
+    dates = pd.to_datetime(df["date_time"], cache=False).dt.normalize()
+    df.insert(
+        len(df.columns),
+        "is_holiday",
+        dates.isin(holiday_dates).to_numpy(dtype=np.int8),
+    )
+    df.insert(
+        len(df.columns),
+        "adj_hours",
+        dates.isin(adj_hours_dates).to_numpy(dtype=np.int8),
     )
 
 
 def remove_non_business_hour_datetimes(df: pd.DataFrame) -> None:
-    tz = df["time_zone"][0]
-    summer_open = df["summer_hours_open"][0]
-    summer_close = df["summer_hours_close"][0]
-    winter_open = df["winter_hours_open"][0]
-    winter_close = df["winter_hours_close"][0]
-    for i, date in enumerate(df["date_time"]):
-        if df["is_closed_sunday"][i] and date.dayofweek == 6:
-            df.drop(index=i, inplace=True)
-
-        if is_dst(date.year, date.month, date.day, tz):
-            if date.hour < summer_open or date.hour >= summer_close:
-                df.drop(index=i, inplace=True)
-        else:
-            if date.hour < winter_open or date.hour >= winter_close:
-                df.drop(index=i, inplace=True)
+    if df.shape[0] == 0:
+        return
+
+    is_business_hour = business_hour_mask(
+        pd.to_datetime(df["date_time"], cache=False), df.iloc[0]
+    )
+    df.drop(index=df.index[~is_business_hour], inplace=True)
+    df.reset_index(inplace=True, drop=True)
 
 
 def modify_datetime_fields(df: pd.DataFrame) -> None:
@@ -199,4 +119,55 @@ def clean_data(df: pd.DataFrame) -> None:
         modify_datetime_fields,
         enumerate_weather,
     ]:
-        cleaning_fn(df)
+        with instruments.stage(f"clean.{cleaning_fn.__name__}", rows_in=df.shape[0]) as record:
+            cleaning_fn(df)
+            record["rows_out"] = df.shape[0]
+
+
+"""
+the same cleaning split in two stages, so the work that only depends on the
+weather runs once per zip code instead of once per store in it
+"""
+
+
+def clean_weather(df: pd.DataFrame) -> None:
+    """
+    per zip stage on the hourly weather: hour, holiday flags, normalized
+    condition and intensities
+    """
+    for cleaning_fn in [
+        add_and_modify_hour_column,
+        add_and_modify_holiday_fields,
+        enumerate_weather,
+    ]:
+        with instruments.stage(f"clean.{cleaning_fn.__name__}", rows_in=df.shape[0]) as record:
+            cleaning_fn(df)
+            record["rows_out"] = df.shape[0]
+
+
+def clean_store_data(
+    weather: pd.DataFrame, store: pd.Series, orders: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    per store stage on weather that went through clean_weather: keeps the
+    store's business hours, joins its orders and drops incomplete rows. weather
+    is left untouched for the other stores in the zip code.
+    """
+    with instruments.stage("clean.business_hours", rows_in=weather.shape[0]) as record:
+        is_business_hour = business_hour_mask(
+            pd.to_datetime(weather["date_time"], cache=False), store
+        )
+        data = weather.iloc[np.flatnonzero(is_business_hour)]
+        record["rows_out"] = data.shape[0]
+
+    with instruments.stage("clean.join_orders", rows_in=data.shape[0]):
+        data = pd.merge(data, orders, how="left", on="date_time")
+        # same column order as clean_data, orders follow the raw weather columns
+        data.insert(
+            data.columns.get_loc("precipitation") + 1, "car_count", data.pop("car_count")
+        )
+
+    with instruments.stage("clean.drop_na_rows", rows_in=data.shape[0]) as record:
+        drop_na_rows(data)
+        record["rows_out"] = data.shape[0]
+    return data
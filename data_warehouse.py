@@ -1,12 +1,25 @@
 import psycopg2
+import numpy as np
 import pandas as pd
 import datetime
 import logging
+import os
+import threading
+import uuid
 import boto3
+from psycopg2.extras import execute_values
+from contextlib import contextmanager
+from typing import Iterator
 
 from error_strings import *
 from query_strings import *
 from error_types import ConnectionError, RedshiftDWError
+from connection_pool import ConnectionPool
+from condition_lexicon import lexicon, condition_whitespace, weather_condition_columns
+from data_cleanup import holiday_dates, adj_hours_dates
+from statement_cache import StatementCachingConnection
+from extract_cache import ExtractCache
+from instrumentation import instruments
 from elastic_net_model import ElasticNetModel
 from config import Config
 
@@ -17,6 +30,22 @@ earliest_weather_year = 2023
 earliest_weather_month = 9
 earliest_weather_day = 6
 
+# keeps `in (...)` lists for the bulk getters to a size redshift plans quickly
+bulk_query_chunk_size = 500
+default_fetch_batch_size = 10000
+# rows per multi-row insert statement when writing results back
+write_page_size = 1000
+# columns of the warehouse built features, in the order data_cleanup produces them
+store_feature_columns = [
+    "date_time",
+    "condition",
+    "precipitation",
+    "car_count",
+    "hour",
+    "is_holiday",
+    "adj_hours",
+] + weather_condition_columns
+
 
 class RedshiftDW:
     host: str
@@ -24,6 +53,13 @@ class RedshiftDW:
     name: str
     username: str
     password: str
+    pool_size: int
+    pool_health_check_seconds: float
+    pool_timeout_seconds: float
+    fetch_batch_size: int
+    prepare_statements: bool
+    cache: ExtractCache
+    cache_store_max_age_seconds: float
 
     """
     DATA SETTERS
@@ -31,249 +67,597 @@ class RedshiftDW:
 
     def set_region_coefficient_vals(self, m: ElasticNetModel, region_number: str) -> None:
         log.info(f"setting coeffient values in data warehouse for region {region_number}")
-        coefficient_values = m.coefficients
-
-        self.connect()
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute(begin)
-            cursor.execute(insert_region_coefficient_fields.format(
-                region_number,
-                coefficient_values[0],
-                coefficient_values[1],
-                coefficient_values[2],
-                coefficient_values[3],
-                coefficient_values[4],
-                coefficient_values[5],
-                coefficient_values[6],
-                coefficient_values[7],
-                coefficient_values[8],
-                coefficient_values[9],
-            ))
-        except Exception as e:
-            raise RedshiftDWError(
-                data={
-                    "host": self.host,
-                    "port": self.port,
-                    "name": self.name,
-                    "username": self.username,
-                    "query": insert_region_coefficient_fields.format(
-                        region_number,
-                        coefficient_values[0],
-                        coefficient_values[1],
-                        coefficient_values[2],
-                        coefficient_values[3],
-                        coefficient_values[4],
-                        coefficient_values[5],
-                        coefficient_values[6],
-                        coefficient_values[7],
-                        coefficient_values[8],
-                        coefficient_values[9],
-                    ),
-                    "err": e,
-                },
-                message=error_setting_region_coefficients,
-            )
-        finally:
-            cursor.close()
-            self.close()
+        self.write_model_results([[region_number, *m.coefficients]], [])
 
     def set_store_elastic_net_values(self, location_number: str, l1_ratio: float, alpha: float, mae: float):
         log.info(f"setting elastic net hyperparameters and mae for elastic net model for store number {location_number}")
+        self.write_model_results([], [[location_number, l1_ratio, alpha, mae]])
+
+    @instruments.timed("warehouse.write_model_results")
+    def write_model_results(self, region_rows: list, store_rows: list) -> None:
+        """
+        writes region coefficient rows (region number + one value per regressor)
+        and store hyperparameter rows (location number, l1 ratio, alpha, mae) in a
+        single transaction. store rows are staged in a temp table and applied
+        with one update, rather than one update per store. a failure rolls back
+        the whole write and logs the page of rows it happened on.
+        """
+        log.info(
+            f"writing {len(region_rows)} region coefficient rows and "
+            f"{len(store_rows)} store hyperparameter rows"
+        )
+        with self.cursor() as cursor:
+            query = None
+            try:
+                cursor.execute(begin)
+                if len(region_rows) > 0:
+                    query = insert_region_coefficient_rows
+                    self.write_pages(
+                        cursor, query, region_rows, "region", region_coefficient_row_template
+                    )
+                if len(store_rows) > 0:
+                    query = create_store_parameters_staging
+                    # temp tables live as long as the session, and pooled sessions are reused
+                    cursor.execute(drop_store_parameters_staging)
+                    cursor.execute(query)
+                    query = insert_store_parameters_staging
+                    self.write_pages(cursor, query, store_rows, "store")
+                    query = update_store_en_fields_from_staging
+                    cursor.execute(query)
+                    cursor.execute(drop_store_parameters_staging)
+                cursor.execute(commit)
+            except Exception as e:
+                log.error(
+                    f"writing model results failed, none of the {len(region_rows)} region "
+                    f"and {len(store_rows)} store rows were written: {e}"
+                )
+                raise RedshiftDWError(
+                    data={
+                        "host": self.host,
+                        "port": self.port,
+                        "name": self.name,
+                        "username": self.username,
+                        "query": query,
+                        "region_rows": len(region_rows),
+                        "store_rows": len(store_rows),
+                        "err": e,
+                    },
+                    message=error_writing_model_results,
+                )
 
-        self.connect()
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute(begin)
-            cursor.execute(update_store_en_fields.format(l1_ratio, alpha, mae, location_number))
-            cursor.execute(commit)
-        except Exception as e:
-            raise RedshiftDWError(
-                data={
-                    "host": self.host,
-                    "port": self.port,
-                    "name": self.name,
-                    "username": self.username,
-                    "query": update_store_en_fields.format(l1_ratio, alpha, mae, location_number),
-                    "err": e,
-                },
-                message=error_updating_store_hyperparameters,
-            )
-        finally:
-            cursor.close()
-            self.close()
+    def write_pages(
+        self, cursor, query: str, rows: list, kind: str, template: str = None
+    ) -> None:
+        """
+        execute_values one page at a time, so a failure is logged with the rows
+        of the page it happened on. the first field of a row is its key.
+        """
+        for start in range(0, len(rows), write_page_size):
+            page = rows[start : start + write_page_size]
+            try:
+                execute_values(cursor, query, page, template=template, page_size=len(page))
+            except Exception:
+                log.error(
+                    f"writing {kind} rows {start} to {start + len(page) - 1} failed, "
+                    f"{kind}s {page[0][0]} to {page[-1][0]}"
+                )
+                raise
 
     """
     DATA GETTERS
     """
 
     def get_orders_by_store_number(self, store_number: str) -> pd.DataFrame:
-        log.info(f"retrieving orders for store {store_number}")
-        time_period_start, time_period_end = self.get_datetimes_for_order_query()
+        if self.cache is None:
+            return self.fetch_orders_by_store_number(store_number)
+        return self.cache.refresh(
+            "orders",
+            store_number,
+            "date_time",
+            lambda since: self.fetch_orders_by_store_number(store_number, since),
+        )
 
-        self.connect()
-        cursor = self.connection.cursor()
-        try:
-            orders_df = self.get_rows(
-                cursor,
-                get_orders_by_store_number.format(
-                    time_period_start, time_period_end, store_number
-                ),
-            )
-        except Exception as e:
-            raise RedshiftDWError(
-                data={
-                    "host": self.host,
-                    "port": self.port,
-                    "name": self.name,
-                    "username": self.username,
-                    "query": get_orders_by_store_number.format(store_number),
-                    "err": e,
-                },
-                message=error_executing_store_orders_query,
+    def get_stores_by_zip_code(self, zipcode: str) -> pd.DataFrame:
+        if self.cache is None:
+            return self.fetch_stores_by_zip_code(zipcode)
+        return self.cache.get_or_fetch(
+            "stores",
+            zipcode,
+            self.cache_store_max_age_seconds,
+            lambda: self.fetch_stores_by_zip_code(zipcode),
+        )
+
+    def get_historic_weather_by_zip_code(self, zipcode: str) -> pd.DataFrame:
+        if self.cache is None:
+            weather_df = self.fetch_daily_weather_by_zip_code(zipcode)
+        else:
+            weather_df = self.cache.refresh(
+                "weather",
+                zipcode,
+                "weather_date",
+                lambda since: self.fetch_daily_weather_by_zip_code(zipcode, since),
             )
-        finally:
-            cursor.close()
-            self.close()
+        return self.convert_daily_weather_to_hourly_dataframe(weather_df)
+
+    @instruments.timed("warehouse.fetch_orders", key="store_number")
+    def fetch_orders_by_store_number(
+        self, store_number: str, since: datetime.date = None
+    ) -> pd.DataFrame:
+        log.info(f"retrieving orders for store {store_number}")
+        time_period_start, time_period_end = self.get_datetimes_for_order_query(since)
+        orders_df = self.get_key_rows(
+            "get_orders_by_store_number",
+            get_orders_by_store_number,
+            {
+                "time_period_start": time_period_start,
+                "time_period_end": time_period_end,
+                "location_number": store_number,
+            },
+            error_executing_store_orders_query,
+        )
 
         log.info(f"retrieved {orders_df.shape[0]} orders for store {store_number}")
         return orders_df
 
-    def get_stores_by_zip_code(self, zipcode: str) -> pd.DataFrame:
+    @instruments.timed("warehouse.fetch_stores", key="zipcode")
+    def fetch_stores_by_zip_code(self, zipcode: str) -> pd.DataFrame:
         log.info(f"retrieving stores for the zipcode {zipcode}")
-        self.connect()
-        cursor = self.connection.cursor()
-        try:
-            store_df = self.get_rows(cursor, get_stores_by_zipcode.format(zipcode))
-        except Exception as e:
-            raise RedshiftDWError(
-                data={
-                    "host": self.host,
-                    "port": self.port,
-                    "name": self.name,
-                    "username": self.username,
-                    "query": get_stores_by_zipcode.format(zipcode),
-                    "err": e,
-                },
-                message=error_executing_store_params_query,
-            )
-        finally:
-            cursor.close()
-            self.close()
+        store_df = self.get_key_rows(
+            "get_stores_by_zipcode",
+            get_stores_by_zipcode,
+            {"zip_code": zipcode},
+            error_executing_store_params_query,
+        )
 
         log.info(f"successfully retrieved stores for the zipcode {zipcode}")
         return store_df
 
-    def get_historic_weather_by_zip_code(self, zipcode: str) -> pd.DataFrame:
+    @instruments.timed("warehouse.fetch_weather", key="zipcode")
+    def fetch_daily_weather_by_zip_code(
+        self, zipcode: str, since: datetime.date = None
+    ) -> pd.DataFrame:
         log.info(f"getting historic weather data for zipcode {zipcode}")
-        self.connect()
-        cursor = self.connection.cursor()
-        try:
-            weather_df = self.get_rows(
-                cursor, get_historic_weather_for_zip_code.format(zipcode)
+        if since is None:
+            weather_df = self.get_key_rows(
+                "get_historic_weather_for_zip_code",
+                get_historic_weather_for_zip_code,
+                {"zip_code": zipcode, "last_weather_date": self.get_last_weather_date()},
+                error_executing_historic_weather_query,
             )
-        except Exception as e:
-            raise RedshiftDWError(
-                data={
-                    "host": self.host,
-                    "port": self.port,
-                    "name": self.name,
-                    "username": self.username,
-                    "query": get_historic_weather_for_zip_code.format(zipcode),
-                    "err": e,
+        else:
+            weather_df = self.get_key_rows(
+                "get_historic_weather_for_zip_code_since",
+                get_historic_weather_for_zip_code_since,
+                {
+                    "zip_code": zipcode,
+                    "since": since,
+                    "last_weather_date": self.get_last_weather_date(),
                 },
-                message=error_executing_historic_weather_query,
+                error_executing_historic_weather_query,
             )
-        finally:
-            cursor.close()
-            self.close()
 
         log.info(f"successfully retrieved historic weather data for zipcode {zipcode}")
-        return self.convert_daily_weather_to_hourly_dataframe(weather_df)
+        return weather_df
 
+    @instruments.timed("warehouse.fetch_zip_codes")
     def get_distinct_zip_codes_for_stores(self) -> pd.DataFrame:
         log.info("retrieving distinct zipcodes")
-        self.connect()
-        cursor = self.connection.cursor()
-        try:
-            zip_code_df = self.get_rows(cursor, get_distinct_zip_codes)
-        except Exception as e:
-            raise RedshiftDWError(
-                data={
-                    "host": self.host,
-                    "port": self.port,
-                    "name": self.name,
-                    "username": self.username,
-                    "query": get_distinct_zip_codes,
-                    "err": e,
-                },
-                message=error_executing_zip_code_query,
-            )
-        finally:
-            cursor.close()
-            self.close()
+        with self.cursor(server_side=True) as cursor:
+            try:
+                zip_code_df = self.get_rows(cursor, get_distinct_zip_codes)
+            except Exception as e:
+                raise RedshiftDWError(
+                    data={
+                        "host": self.host,
+                        "port": self.port,
+                        "name": self.name,
+                        "username": self.username,
+                        "query": get_distinct_zip_codes,
+                        "err": e,
+                    },
+                    message=error_executing_zip_code_query,
+                )
 
         log.info("retrieved distinct zipcodes")
         return zip_code_df
 
     """
-    TRANSLATION HELPERS
+    BULK DATA GETTERS
     """
 
-    def get_rows(self, cursor, query: str) -> pd.DataFrame:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        return pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+    def get_orders_by_store_numbers(self, store_numbers: list) -> dict:
+        if self.cache is None:
+            return self.fetch_orders_by_store_numbers(store_numbers)
+        return self.cache.refresh_many(
+            "orders", store_numbers, "date_time", self.fetch_orders_by_store_numbers
+        )
 
-    def convert_daily_weather_to_hourly_dataframe(
-        self, daily_weather_df: pd.DataFrame
-    ) -> pd.DataFrame:
-        log.info("converting retrieved weather data to hourly data")
-        yesterday = datetime.date.today() - datetime.timedelta(days=1)
-        converted_df = pd.DataFrame(
-            [], columns=["date_time", "condition", "precipitation"]
+    def get_stores_by_zip_codes(self, zipcodes: list) -> dict:
+        if self.cache is None:
+            return self.fetch_stores_by_zip_codes(zipcodes)
+        return self.cache.get_or_fetch_many(
+            "stores",
+            zipcodes,
+            self.cache_store_max_age_seconds,
+            self.fetch_stores_by_zip_codes,
+        )
+
+    def get_historic_weather_by_zip_codes(self, zipcodes: list) -> dict:
+        if self.cache is None:
+            daily_weather_by_zip = self.fetch_daily_weather_by_zip_codes(zipcodes)
+        else:
+            daily_weather_by_zip = self.cache.refresh_many(
+                "weather", zipcodes, "weather_date", self.fetch_daily_weather_by_zip_codes
+            )
+        return {
+            zipcode: self.convert_daily_weather_to_hourly_dataframe(daily_weather_df)
+            for zipcode, daily_weather_df in daily_weather_by_zip.items()
+        }
+
+    @instruments.timed("warehouse.fetch_orders", key="store_numbers")
+    def fetch_orders_by_store_numbers(
+        self, store_numbers: list, since: datetime.date = None
+    ) -> dict:
+        log.info(f"retrieving orders for {len(store_numbers)} stores")
+        time_period_start, time_period_end = self.get_datetimes_for_order_query(since)
+
+        orders_df = self.get_chunked_rows(
+            get_orders_by_store_numbers,
+            store_numbers,
+            lambda chunk: {
+                "time_period_start": time_period_start,
+                "time_period_end": time_period_end,
+                "location_numbers": tuple(chunk),
+            },
+            error_executing_store_orders_query,
+        )
+        orders_by_store = self.partition_rows(
+            orders_df, "location_number", store_numbers, ["date_time", "car_count"]
         )
-        for row in daily_weather_df.iterrows():
-            date = row[1]["weather_date"]
 
-            if yesterday - date < datetime.timedelta(0):
-                continue
+        log.info(f"retrieved {orders_df.shape[0]} orders for {len(store_numbers)} stores")
+        return orders_by_store
+
+    @instruments.timed("warehouse.fetch_stores", key="zipcodes")
+    def fetch_stores_by_zip_codes(self, zipcodes: list) -> dict:
+        log.info(f"retrieving stores for {len(zipcodes)} zipcodes")
+        store_df = self.get_chunked_rows(
+            get_stores_by_zipcodes,
+            zipcodes,
+            lambda chunk: {"zip_codes": tuple(chunk)},
+            error_executing_store_params_query,
+        )
+        stores_by_zip = self.partition_rows(
+            store_df,
+            "zip_code",
+            zipcodes,
+            [
+                "region_number",
+                "location_number",
+                "is_closed_sunday",
+                "summer_hours_open",
+                "summer_hours_close",
+                "winter_hours_open",
+                "winter_hours_close",
+                "time_zone",
+            ],
+        )
 
-            condition = row[1]["condition_text"]
-            precipitation = (
-                row[1]["total_precipitation"]
-                if row[1]["total_precipitation"] != None
-                else 0
+        log.info(f"successfully retrieved stores for {len(zipcodes)} zipcodes")
+        return stores_by_zip
+
+    @instruments.timed("warehouse.fetch_store_hyperparameters", key="store_numbers")
+    def get_store_hyperparameters(self, store_numbers: list) -> dict:
+        """
+        the l1_ratio and alpha each store was last tuned with, for the stores
+        that have been tuned
+        """
+        log.info(f"retrieving hyperparameters for {len(store_numbers)} stores")
+        if len(store_numbers) == 0:
+            return {}
+        params_df = self.get_chunked_rows(
+            get_store_hyperparameters_by_store_numbers,
+            store_numbers,
+            lambda chunk: {"location_numbers": tuple(chunk)},
+            error_executing_store_params_query,
+        )
+        return {
+            location_number: {"l1_ratio": float(l1_ratio), "alpha": float(alpha)}
+            for location_number, l1_ratio, alpha in params_df[
+                ["location_number", "l1_ratio", "alpha"]
+            ].itertuples(index=False)
+        }
+
+    @instruments.timed("warehouse.fetch_weather", key="zipcodes")
+    def fetch_daily_weather_by_zip_codes(
+        self, zipcodes: list, since: datetime.date = None
+    ) -> dict:
+        log.info(f"getting historic weather data for {len(zipcodes)} zipcodes")
+        last_weather_date = self.get_last_weather_date()
+        if since is None:
+            weather_df = self.get_chunked_rows(
+                get_historic_weather_for_zip_codes,
+                zipcodes,
+                lambda chunk: {
+                    "zip_codes": tuple(chunk),
+                    "last_weather_date": last_weather_date,
+                },
+                error_executing_historic_weather_query,
             )
+        else:
+            weather_df = self.get_chunked_rows(
+                get_historic_weather_for_zip_codes_since,
+                zipcodes,
+                lambda chunk: {
+                    "zip_codes": tuple(chunk),
+                    "since": since,
+                    "last_weather_date": last_weather_date,
+                },
+                error_executing_historic_weather_query,
+            )
+        daily_weather_by_zip = self.partition_rows(
+            weather_df,
+            "zip_code",
+            zipcodes,
+            ["weather_date", "condition_text", "total_precipitation"],
+        )
 
-            hourly_weather_array = []
-            for hour in range(0, 24):
-                hour_timestamp = datetime.datetime(
-                    date.year, date.month, date.day, hour
+        log.info(f"successfully retrieved historic weather data for {len(zipcodes)} zipcodes")
+        return daily_weather_by_zip
+
+    @instruments.timed("warehouse.fetch_store_features", key="store_numbers")
+    def fetch_store_features_by_store_numbers(self, store_numbers: list) -> dict:
+        """
+        model ready rows per store, built in the warehouse. the condition
+        lexicon is loaded into a temp table of the session first, so every
+        chunk runs on that one connection.
+        """
+        log.info(f"building features in the data warehouse for {len(store_numbers)} stores")
+        time_period_start, time_period_end = self.get_datetimes_for_order_query()
+        last_weather_date = self.get_last_weather_date()
+        vocabulary = lexicon.vocabulary()
+        lexicon_rows = [
+            [condition, *map(int, intensities)]
+            for condition, intensities in zip(vocabulary.index, vocabulary.to_numpy())
+        ]
+
+        frames = []
+        with self.cursor() as cursor:
+            query = create_condition_lexicon_table
+            params = None
+            try:
+                cursor.execute(drop_condition_lexicon_table)
+                cursor.execute(query)
+                query = insert_condition_lexicon_rows
+                execute_values(cursor, query, lexicon_rows, page_size=write_page_size)
+
+                query = get_store_features_by_store_numbers
+                for i in range(0, len(store_numbers), bulk_query_chunk_size):
+                    params = {
+                        "location_numbers": tuple(store_numbers[i : i + bulk_query_chunk_size]),
+                        "time_period_start": time_period_start,
+                        "time_period_end": time_period_end,
+                        "last_weather_date": last_weather_date,
+                        "holiday_dates": tuple(holiday_dates.strftime("%Y-%m-%d")),
+                        "adj_hours_dates": tuple(adj_hours_dates.strftime("%Y-%m-%d")),
+                        "whitespace": condition_whitespace,
+                    }
+                    chunk_cursor = self.open_cursor(cursor.connection, server_side=True)
+                    try:
+                        frames.append(self.get_rows(chunk_cursor, query, params))
+                    finally:
+                        chunk_cursor.close()
+            except Exception as e:
+                raise RedshiftDWError(
+                    data={
+                        "host": self.host,
+                        "port": self.port,
+                        "name": self.name,
+                        "username": self.username,
+                        "query": query,
+                        "params": params,
+                        "err": e,
+                    },
+                    message=error_executing_store_features_query,
                 )
-                hourly_weather_array.append(
-                    [hour_timestamp, condition, precipitation / 24]
+
+        features_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame([])
+        features_by_store = self.partition_rows(
+            features_df, "location_number", store_numbers, store_feature_columns
+        )
+        log.info(f"built {features_df.shape[0]} feature rows for {len(store_numbers)} stores")
+        return features_by_store
+
+    """
+    TRANSLATION HELPERS
+    """
+
+    def iter_rows(
+        self, query: str, params: dict = None, batch_size: int = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        streams a query's result as frames of at most batch_size rows through a
+        server side cursor, so only one batch is held in memory at a time. the
+        connection stays checked out until the generator is exhausted or closed.
+        """
+        with self.cursor(server_side=True) as cursor:
+            yield from self.iter_batches(cursor, query, params, batch_size)
+
+    def iter_batches(
+        self,
+        cursor,
+        query: str,
+        params: dict = None,
+        batch_size: int = None,
+        statement_name: str = None,
+    ) -> Iterator[pd.DataFrame]:
+        batch_size = batch_size or self.fetch_batch_size or default_fetch_batch_size
+        self.execute(cursor, query, params, statement_name)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            # named cursors only describe their columns after the first fetch
+            columns = [desc[0] for desc in cursor.description]
+            if len(rows) == 0:
+                return
+            yield pd.DataFrame(rows, columns=columns)
+
+    def get_rows(
+        self, cursor, query: str, params: dict = None, statement_name: str = None
+    ) -> pd.DataFrame:
+        if self.fetch_batch_size == 0:
+            self.execute(cursor, query, params, statement_name)
+            rows = cursor.fetchall()
+            return pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+
+        # converting batch by batch avoids holding every row as a python tuple at once
+        frames = list(self.iter_batches(cursor, query, params, statement_name=statement_name))
+        if len(frames) == 0:
+            return pd.DataFrame([], columns=[desc[0] for desc in cursor.description])
+        if len(frames) == 1:
+            return frames[0]
+        # a batch of all-null values can come back as object, re-infer across batches
+        return pd.concat(frames, ignore_index=True).infer_objects()
+
+    def execute(
+        self, cursor, query: str, params: dict = None, statement_name: str = None
+    ) -> None:
+        """
+        with a statement name, the query is prepared once per connection and
+        executed by name. named cursors can only declare a plain select, so
+        they always run the query text.
+        """
+        if (
+            statement_name is not None
+            and cursor.name is None
+            and isinstance(cursor.connection, StatementCachingConnection)
+        ):
+            cursor.connection.execute_prepared(cursor, statement_name, query, params)
+            return
+        cursor.execute(query, params)
+
+    def get_key_rows(
+        self, statement_name: str, query: str, params: dict, error_message: str
+    ) -> pd.DataFrame:
+        """
+        runs one of the per key queries. a key's result is small, so it is read
+        through a client side cursor, which lets the statement be prepared.
+        """
+        with self.cursor() as cursor:
+            try:
+                return self.get_rows(cursor, query, params, statement_name)
+            except Exception as e:
+                raise RedshiftDWError(
+                    data={
+                        "host": self.host,
+                        "port": self.port,
+                        "name": self.name,
+                        "username": self.username,
+                        "statement": statement_name,
+                        "query": query,
+                        "params": params,
+                        "err": e,
+                    },
+                    message=error_message,
                 )
 
-            converted_df = pd.concat(
-                [
-                    converted_df,
-                    pd.DataFrame(
-                        hourly_weather_array,
-                        columns=["date_time", "condition", "precipitation"],
-                    ),
-                ]
-            )
+    def get_chunked_rows(
+        self, query: str, keys: list, params_fn, error_message: str
+    ) -> pd.DataFrame:
+        frames = []
+        for i in range(0, len(keys), bulk_query_chunk_size):
+            params = params_fn(keys[i : i + bulk_query_chunk_size])
+            # server side cursors run a single query each
+            with self.cursor(server_side=True) as cursor:
+                try:
+                    frames.append(self.get_rows(cursor, query, params))
+                except Exception as e:
+                    raise RedshiftDWError(
+                        data={
+                            "host": self.host,
+                            "port": self.port,
+                            "name": self.name,
+                            "username": self.username,
+                            "query": query,
+                            "params": params,
+                            "err": e,
+                        },
+                        message=error_message,
+                    )
+
+        if len(frames) == 0:
+            return pd.DataFrame([])
+        return pd.concat(frames, ignore_index=True)
+
+    def partition_rows(
+        self, df: pd.DataFrame, key_column: str, keys: list, columns: list
+    ) -> dict:
+        """
+        splits a bulk result into one frame per key, shaped like the result of
+        the matching single-key getter. keys without rows map to an empty frame.
+        """
+        partitions = {key: pd.DataFrame([], columns=columns) for key in keys}
+        if df.shape[0] == 0:
+            return partitions
+
+        for key, group in df.groupby(key_column, sort=False):
+            partitions[key] = group.loc[:, columns].reset_index(drop=True)
+        return partitions
+
+    def convert_daily_weather_to_hourly_dataframe(
+        self, daily_weather_df: pd.DataFrame
+    ) -> pd.DataFrame:
+        log.info("converting retrieved weather data to hourly data")
+        yesterday = self.get_last_weather_date()
+        columns = ["date_time", "condition", "precipitation"]
+        if daily_weather_df.shape[0] == 0:
+            log.info("converted retrieved weather data to hourly data")
+            return pd.DataFrame([], columns=columns)
+
+        weather_dates = pd.to_datetime(daily_weather_df["weather_date"])
+        in_range = (weather_dates <= pd.Timestamp(yesterday)).to_numpy()
+        if not in_range.any():
+            log.info("converted retrieved weather data to hourly data")
+            return pd.DataFrame([], columns=columns)
+
+        # missing precipitation means none fell, spread evenly over the day. it
+        # comes back as None or, in a column with values, as nan
+        precipitation = daily_weather_df["total_precipitation"][in_range]
+        precipitation = precipitation.astype(float).fillna(0) / 24
+
+        hours = np.tile(np.arange(24), int(in_range.sum()))
+        converted_df = pd.DataFrame(
+            {
+                "date_time": np.repeat(weather_dates[in_range].to_numpy(), 24)
+                + hours * np.timedelta64(1, "h"),
+                "condition": np.repeat(
+                    daily_weather_df["condition_text"][in_range].to_numpy(), 24
+                ),
+                "precipitation": np.repeat(precipitation.to_numpy(), 24),
+            },
+            index=hours,
+        ).infer_objects()
 
         log.info("converted retrieved weather data to hourly data")
         return converted_df
 
-    def get_datetimes_for_order_query(self) -> tuple[str, str]:
+    def get_last_weather_date(self) -> datetime.date:
+        """
+        dw.weather carries forecasts for the coming days, only observed weather,
+        up to yesterday, is read. it also keeps forecasts out of the extract cache,
+        where their dates would run the watermark ahead of the observations.
+        """
+        return datetime.date.today() - datetime.timedelta(days=1)
+
+    def get_datetimes_for_order_query(
+        self, since: datetime.date = None
+    ) -> tuple[str, str]:
         time_period_start = datetime.datetime(
             year=earliest_weather_year,
             month=earliest_weather_month,
             day=earliest_weather_day,
         ).strftime("%Y-%m-%d")
+        if since is not None:
+            time_period_start = pd.Timestamp(since).strftime("%Y-%m-%d")
         time_period_end = datetime.datetime.now(datetime.timezone.utc).strftime(
             "%Y-%m-%d"
         )
@@ -283,9 +667,69 @@ class RedshiftDW:
     CONNECTION HELPERS
     """
 
-    def connect(self) -> None:
+    @contextmanager
+    def cursor(self, server_side: bool = False):
+        """
+        checks a connection out for the duration of the block and hands back a
+        cursor on it. in pool mode the connection is returned to the pool
+        afterwards, otherwise it is opened and closed around the block.
+
+        server_side gives a named cursor that fetches fetch_batch_size rows per
+        round trip instead of the whole result. it can run a single select.
+        """
+        conn = self.checkout()
+        try:
+            cursor = self.open_cursor(conn, server_side)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+        finally:
+            self.checkin(conn)
+
+    def open_cursor(self, conn: psycopg2.extensions.connection, server_side: bool = False):
+        if server_side and self.fetch_batch_size > 0:
+            cursor = conn.cursor(name=f"weather_analytics_{uuid.uuid4().hex}")
+            cursor.itersize = self.fetch_batch_size
+            return cursor
+        return conn.cursor()
+
+    def checkout(self) -> psycopg2.extensions.connection:
+        if self.pool_size == 0:
+            return self.open_connection()
+        return self.get_pool().checkout()
+
+    def checkin(self, conn: psycopg2.extensions.connection) -> None:
+        if self.pool_size == 0:
+            conn.close()
+            return
+        self.get_pool().checkin(conn)
+
+    def get_pool(self) -> ConnectionPool:
+        # extraction threads may race to build the first pool
+        with self._pool_lock:
+            # a pool inherited through fork still points at the parent's sockets
+            if self._pool is None or self._pool.pid != os.getpid():
+                log.info(f"creating redshift connection pool of size {self.pool_size}")
+                self._pool = ConnectionPool(
+                    self.open_connection,
+                    self.pool_size,
+                    self.pool_health_check_seconds,
+                    self.pool_timeout_seconds,
+                )
+            return self._pool
+
+    def close_pool(self) -> None:
+        if self._pool is not None and self._pool.pid == os.getpid():
+            self._pool.close_all()
+        self._pool = None
+
+    def open_connection(self) -> psycopg2.extensions.connection:
         try:
             conn = psycopg2.connect(
+                connection_factory=(
+                    StatementCachingConnection if self.prepare_statements else None
+                ),
                 host=self.host,
                 port=self.port,
                 dbname=self.name,
@@ -315,15 +759,40 @@ class RedshiftDW:
                 message=unexpected_connection_status,
             )
 
-        self.connection = conn
+        return conn
+
+    def connect(self) -> None:
+        self.connection = self.open_connection()
 
     def close(self) -> None:
         self.connection.close()
         self.connection = None
 
+    def __getstate__(self) -> dict:
+        # connections and pools cannot cross process boundaries, workers open their own
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["connection"] = None
+        del state["_pool_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._pool_lock = threading.Lock()
+
     def __init__(self, c: Config):
         self.host = c.db_host
         self.port = c.db_port
         self.name = c.db_name
         self.username = c.db_user
         self.password = c.db_password
+        self.pool_size = c.db_pool_size
+        self.pool_health_check_seconds = c.db_pool_health_check_seconds
+        self.pool_timeout_seconds = c.db_pool_timeout_seconds
+        self.fetch_batch_size = c.db_fetch_batch_size
+        self.prepare_statements = c.db_prepare_statements
+        self.connection = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.cache = ExtractCache(c.cache_dir) if c.cache_dir else None
+        self.cache_store_max_age_seconds = c.cache_store_max_age_hours * 3600
@@ -1,11 +1,15 @@
 import logging
 import boto3
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
+from joblib import parallel_config
 from sklearn.linear_model import ElasticNet, enet_path
-from sklearn.model_selection import RepeatedKFold, GridSearchCV
+from sklearn.experimental import enable_halving_search_cv
+from sklearn.model_selection import RepeatedKFold, GridSearchCV, HalvingGridSearchCV
 
 from weather_dictionaries import *
+from instrumentation import instruments
 
 boto3.set_stream_logger("", logging.DEBUG)
 log = logging.getLogger(__name__)
@@ -24,15 +28,39 @@ regressors = [
 ]
 predictor = ["car_count"]
 
+search_strategies = ["grid", "coarse_to_fine", "halving", "path"]
+# needs the l1_ratio and alpha of a previous fit, so incremental runs choose it per model
+warm_start_strategy = "neighborhood"
+
 
 class ElasticNetModel:
     x_train: pd.DataFrame
     y_train: pd.Series
     model: ElasticNet
+    search_strategy: str
+    mae_tolerance: float
+    n_jobs: int
+    blas_threads: int
+    warm_start: dict
     _l1_ratio: float
     _alpha: float
     _coefficients: list
     _mae: float
+    _n_fits: int
+
+    """
+    search settings, overridable per instance
+    """
+    grid_size = 100
+    coarse_grid_size = 10
+    refine_grid_size = 5
+    max_refinements = 4
+    neighborhood_step = 0.05
+    cv_splits = 10
+    cv_repeats = 3
+    max_iter = 100000
+    # fewer rows than this are not fit at all
+    min_training_rows = 11
 
     @property
     def l1_ratio(self):
@@ -50,37 +78,202 @@ class ElasticNetModel:
     def mae(self):
         return self._mae
 
+    @property
+    def n_fits(self):
+        return self._n_fits
+
+    @classmethod
+    def has_enough_rows(cls, n_rows: int) -> bool:
+        """
+        whether a model can be fit on n_rows, callers skip the rest before they
+        reach a worker
+        """
+        return n_rows >= max(cls.min_training_rows, cls.cv_splits)
+
     def coefficient_path(self) -> tuple[pd.DataFrame, pd.DataFrame]:
         alphas, coeffs, _ = enet_path(X=self.x_train, y=self.y_train, l1_ratio=self._l1_ratio, alphas=np.linspace(0, 1, num=100))
         return alphas, coeffs
 
-
     def tune_model(self):
-        log.info("tuning model")
+        log.info(f"tuning model with {self.search_strategy} search")
+        with instruments.stage(
+            f"tune_model.{self.search_strategy}", rows_in=self.x_train.shape[0]
+        ) as record:
+            self._n_fits = 0
+            cv = RepeatedKFold(
+                n_splits=self.cv_splits,
+                n_repeats=self.cv_repeats,
+                random_state=np.random.randint(2**31 - 1),
+            )
+            search_fn = {
+                "grid": self.grid_search,
+                "coarse_to_fine": self.coarse_to_fine_search,
+                "halving": self.halving_search,
+                "path": self.path_search,
+                warm_start_strategy: self.neighborhood_search,
+            }[self.search_strategy]
+
+            self._model, best_params, best_score = search_fn(cv)
+            record["n_fits"] = self._n_fits
+        self._coefficients = self._model.coef_
+        self._l1_ratio = best_params["l1_ratio"]
+        self._alpha = best_params["alpha"]
+        self._mae = np.abs(best_score)
+        log.info(f"tuned model in {self._n_fits} fits with mae {self._mae}")
+
+    def grid_search(self, cv: RepeatedKFold) -> tuple[ElasticNet, dict, float]:
+        grid = dict()
+        grid["l1_ratio"] = np.linspace(0, 1, num=self.grid_size)
+        grid["alpha"] = np.linspace(0, 1, num=self.grid_size)
+        return self.best_of(self.run_search(GridSearchCV, grid, cv))
+
+    def coarse_to_fine_search(self, cv: RepeatedKFold) -> tuple[ElasticNet, dict, float]:
+        """
+        searches a coarse grid, then repeatedly searches a smaller grid centred
+        on the best point so far, stopping once a round improves the mae by no
+        more than mae_tolerance (relative)
+        """
+        grid = dict()
+        grid["l1_ratio"] = np.linspace(0, 1, num=self.coarse_grid_size)
+        grid["alpha"] = np.linspace(0, 1, num=self.coarse_grid_size)
+        step = 1 / (self.coarse_grid_size - 1)
+        best = self.run_search(GridSearchCV, grid, cv)
+
+        for _ in range(self.max_refinements):
+            grid["l1_ratio"] = self.refine_axis(best.best_params_["l1_ratio"], step)
+            grid["alpha"] = self.refine_axis(best.best_params_["alpha"], step)
+            step = 2 * step / (self.refine_grid_size - 1)
+            refined = self.run_search(GridSearchCV, grid, cv)
+
+            improvement = refined.best_score_ - best.best_score_
+            if improvement > 0:
+                best = refined
+            if improvement <= self.mae_tolerance * np.abs(best.best_score_):
+                break
+        return self.best_of(best)
+
+    def halving_search(self, cv: RepeatedKFold) -> tuple[ElasticNet, dict, float]:
+        grid = dict()
+        grid["l1_ratio"] = np.linspace(0, 1, num=self.grid_size)
+        grid["alpha"] = np.linspace(0, 1, num=self.grid_size)
+        return self.best_of(
+            self.run_search(
+                HalvingGridSearchCV,
+                grid,
+                cv,
+                min_resources="smallest",
+                aggressive_elimination=True,
+            )
+        )
+
+    def path_search(self, cv: RepeatedKFold) -> tuple[ElasticNet, dict, float]:
+        """
+        same grid as grid_search, but each (fold, l1_ratio) pair solves the whole
+        alpha sequence as one regularization path, warm starting every alpha
+        from the solution at the previous, stronger one
+        """
+        x = self.x_train.to_numpy(dtype=np.float64)
+        y = self.y_train.to_numpy(dtype=np.float64).ravel()
+        l1_ratios = np.linspace(0, 1, num=self.grid_size)
+        # enet_path walks from the strongest regularization down
+        alphas = np.linspace(0, 1, num=self.grid_size)[::-1]
+
+        mae = np.zeros((len(l1_ratios), len(alphas)))
+        n_splits = cv.get_n_splits()
+        for train, test in cv.split(x):
+            # enet_path does not fit an intercept, so center on the training fold
+            x_mean = x[train].mean(axis=0)
+            y_mean = y[train].mean()
+            for i, l1_ratio in enumerate(l1_ratios):
+                _, coefs, _ = enet_path(
+                    x[train] - x_mean,
+                    y[train] - y_mean,
+                    l1_ratio=l1_ratio,
+                    alphas=alphas,
+                    max_iter=self.max_iter,
+                )
+                predictions = (x[test] - x_mean) @ coefs + y_mean
+                mae[i] += np.abs(predictions - y[test][:, np.newaxis]).mean(axis=0)
+                self._n_fits += len(alphas)
+        mae /= n_splits
+
+        i, j = np.unravel_index(np.argmin(mae), mae.shape)
+        best_params = {"l1_ratio": l1_ratios[i], "alpha": alphas[j]}
         m = ElasticNet(
             fit_intercept=True,
-            max_iter=100000,
+            max_iter=self.max_iter,
+            **best_params,
         )
+        m.fit(self.x_train, self.y_train)
+        self._n_fits += 1
+        return m, best_params, -mae[i, j]
+
+    def neighborhood_search(self, cv: RepeatedKFold) -> tuple[ElasticNet, dict, float]:
+        """
+        searches a refine_grid_size grid within neighborhood_step of the warm
+        start's l1_ratio and alpha, for models whose data has only grown since
+        they were last tuned
+        """
+        if self.warm_start is None:
+            log.warning("no warm start for neighborhood search, using path search")
+            return self.path_search(cv)
         grid = dict()
-        grid["l1_ratio"] = np.linspace(0, 1, num=100)
-        grid["alpha"] = np.linspace(0, 1, num=100)
-        cv = RepeatedKFold(n_splits=10, n_repeats=3)
-        search = GridSearchCV(
-            m, grid, scoring="neg_mean_absolute_error", cv=cv, n_jobs=-1
+        grid["l1_ratio"] = self.refine_axis(self.warm_start["l1_ratio"], self.neighborhood_step)
+        grid["alpha"] = self.refine_axis(self.warm_start["alpha"], self.neighborhood_step)
+        return self.best_of(self.run_search(GridSearchCV, grid, cv))
+
+    def best_of(self, results) -> tuple[ElasticNet, dict, float]:
+        return results.best_estimator_, results.best_params_, results.best_score_
+
+    def refine_axis(self, center: float, step: float) -> np.ndarray:
+        return np.linspace(
+            max(0, center - step), min(1, center + step), num=self.refine_grid_size
         )
-        results = search.fit(self.x_train, self.y_train)
-        self._model = results.best_estimator_
-        self._coefficients = self._model.coef_
-        self._l1_ratio = results.best_params_["l1_ratio"]
-        self._alpha = results.best_params_["alpha"]
-        self._mae = np.abs(results.best_score_)
 
+    def run_search(self, search_cls, grid: dict, cv: RepeatedKFold, **kwargs):
+        m = ElasticNet(
+            fit_intercept=True,
+            max_iter=self.max_iter,
+        )
+        search = search_cls(
+            m,
+            grid,
+            scoring="neg_mean_absolute_error",
+            cv=cv,
+            n_jobs=self.n_jobs,
+            **kwargs,
+        )
+        # caps the BLAS threads inside each joblib worker, otherwise joblib decides
+        thread_limits = (
+            parallel_config(backend="loky", inner_max_num_threads=self.blas_threads)
+            if self.blas_threads is not None
+            else nullcontext()
+        )
+        with thread_limits:
+            results = search.fit(self.x_train, self.y_train)
+        # one fit per candidate per fold, plus the refit on the full data
+        self._n_fits += len(results.cv_results_["params"]) * cv.get_n_splits() + 1
+        return results
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        search_strategy: str = "grid",
+        mae_tolerance: float = 0.01,
+        n_jobs: int = -1,
+        blas_threads: int = None,
+        warm_start: dict = None,
+    ) -> None:
+        self.search_strategy = search_strategy
+        self.mae_tolerance = mae_tolerance
+        self.n_jobs = n_jobs
+        self.blas_threads = blas_threads
+        self.warm_start = warm_start
 
-    def __init__(self, data: pd.DataFrame) -> None:
         if data[regressors].shape[0] == 0:
             log.warning(f"no data to fit model on")
             return
-        elif data[regressors].shape[0] <= 10:
+        elif not self.has_enough_rows(data[regressors].shape[0]):
             log.warning(f"not enough data to cross validate")
             return
         
@@ -8,6 +8,17 @@ no_db_name = "no database name for database connection present in config yaml"
 no_db_username = "no username for database connection present in config yaml"
 no_db_password = "no password for database connection present in config yaml"
 no_db_port = "no port for database connection present in config yaml"
+invalid_db_pool_setting = "database connection pool and fetch settings must be non-negative numbers"
+invalid_extract_mode = "extract mode must be one of 'bulk' or 'per_key'"
+invalid_extract_concurrency = "extract concurrency must be a non-negative integer and the extract queue size a positive integer"
+invalid_cache_store_max_age = "maximum age of cached store parameters must be a number of hours"
+invalid_fit_mode = "fit mode must be one of 'region' or 'store'"
+invalid_store_batch_rows = "store batch rows must be a positive integer"
+invalid_search_strategy = "elastic net search strategy is not one of the supported strategies"
+invalid_mae_tolerance = "elastic net mae tolerance must be a non-negative number"
+invalid_feature_mode = "feature mode must be one of 'local' or 'warehouse'"
+invalid_condition_lexicon = "condition lexicon file must be a csv of condition names and intensities between 0 and 127"
+invalid_cpu_budget = "cpu budget, region workers and cv jobs must be whole numbers, with a positive cpu budget and region worker count"
 
 """
 CONNECTION ERRORS
@@ -20,6 +31,10 @@ unexpected_connection_status = (
     "unexpected connection status for returned redshift connection"
 )
 
+connection_pool_exhausted = (
+    "timed out waiting for a free connection in the redshift connection pool"
+)
+
 """
 QUERY ERRORS
 """
@@ -40,4 +55,10 @@ error_updating_store_hyperparameters = (
 )
 error_setting_region_coefficients = (
     "error inserting values for the region's fit coefficients into the data warehouse"
-)
\ No newline at end of file
+)
+error_writing_model_results = (
+    "error writing region coefficients and store hyperparameters to the data warehouse"
+)
+error_executing_store_features_query = (
+    "error building model ready store features in the data warehouse"
+)
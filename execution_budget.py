@@ -0,0 +1,65 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from threadpoolctl import threadpool_limits
+
+log = logging.getLogger(__name__)
+
+
+class ExecutionBudget:
+    """
+    splits a global core budget between the three nested levels of parallelism
+    in a run: region worker processes, the joblib cross validation workers each
+    region starts, and the BLAS threads underneath both. the product of the
+    three never exceeds cpu_budget.
+    """
+
+    cpu_budget: int
+    region_workers: int
+    cv_jobs: int
+    blas_threads: int
+
+    def __init__(self, cpu_budget: int, region_workers: int, cv_jobs: int = 0):
+        self.cpu_budget = max(1, cpu_budget)
+        self.region_workers = max(1, min(region_workers, self.cpu_budget))
+
+        # 0 means give each region worker an even share of what is left
+        cv_share = self.cpu_budget // self.region_workers
+        self.cv_jobs = cv_share if cv_jobs <= 0 else max(1, min(cv_jobs, cv_share))
+        self.blas_threads = max(
+            1, self.cpu_budget // (self.region_workers * self.cv_jobs)
+        )
+
+        if self.region_workers != region_workers or (
+            cv_jobs > 0 and self.cv_jobs != cv_jobs
+        ):
+            log.warning(
+                f"requested {region_workers} region workers x {cv_jobs} cv jobs "
+                f"does not fit a budget of {self.cpu_budget} cpus"
+            )
+        log.info(
+            f"cpu budget {self.cpu_budget}: {self.region_workers} region workers x "
+            f"{self.cv_jobs} cv jobs x {self.blas_threads} blas threads"
+        )
+
+
+def limit_worker_threads(blas_threads: int) -> None:
+    """
+    pool initializer, caps the BLAS/OpenMP thread pools of a worker process for
+    its whole lifetime
+    """
+    threadpool_limits(limits=blas_threads)
+
+
+def region_worker_pool(budget: ExecutionBudget) -> ProcessPoolExecutor:
+    """
+    process pool for the region fits. each region starts its own joblib cross
+    validation workers, which joblib refuses to do from a daemonic
+    multiprocessing.Pool worker and runs the search with n_jobs=1 instead.
+    ProcessPoolExecutor workers are not daemonic.
+    """
+    return ProcessPoolExecutor(
+        budget.region_workers,
+        initializer=limit_worker_threads,
+        initargs=(budget.blas_threads,),
+    )
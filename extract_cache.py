@@ -0,0 +1,252 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+class ExtractCache:
+    """
+    on-disk parquet cache of warehouse extracts, one file per (kind, key), e.g.
+    the daily weather of a zip code or the hourly orders of a store.
+
+    time series extracts are watermarked by their newest timestamp, kept in a
+    file of its own next to the extract so a key without rows is not fetched
+    in full again. a refresh asks the warehouse for rows from a day before the
+    watermark, as the warehouse filters on utc timestamps while the extracts
+    are in local time and the hours at the boundary come back partial. cached
+    rows from the watermark's date on are replaced by the new rows. extracts
+    without a time column are refetched once their file is older than a
+    maximum age.
+    """
+
+    directory: str
+    stats: dict
+    refetch_overlap = datetime.timedelta(days=1)
+
+    def refresh(
+        self, kind: str, key, watermark_column: str, fetch_fn: Callable
+    ) -> pd.DataFrame:
+        """
+        fetch_fn(since) returns the rows for key at or after since, or the full
+        history when since is None
+        """
+        return self.refresh_many(
+            kind,
+            [key],
+            watermark_column,
+            lambda keys, since: {key: fetch_fn(since)},
+        )[key]
+
+    def refresh_many(
+        self, kind: str, keys: list, watermark_column: str, fetch_fn: Callable
+    ) -> dict:
+        """
+        fetch_fn(keys, since) returns a frame per key, like refresh. keys already
+        in the cache are fetched in one call per watermark date.
+        """
+        cached = {key: self.read(kind, key) for key in keys}
+        watermarks = {
+            key: self.read_watermark(kind, key, cached[key], watermark_column)
+            for key in keys
+        }
+        missing = [key for key in keys if watermarks[key] is None]
+        stale = [key for key in keys if key not in missing]
+        results = {}
+
+        if len(missing) > 0:
+            log.info(f"{kind} cache miss for {len(missing)} keys, fetching full history")
+            fetched_at = self.fetch_time()
+            fresh = fetch_fn(missing, None)
+            for key in missing:
+                self.record("misses", fresh[key], 0)
+                self.write(kind, key, fresh[key])
+                self.write_watermark(kind, key, fresh[key], watermark_column, fetched_at)
+                results[key] = fresh[key]
+
+        # keys are refreshed together with the others whose watermark is on the
+        # same date, so one long quiet store does not pull history for the batch
+        stale_by_date = {}
+        for key in stale:
+            stale_by_date.setdefault(watermarks[key].normalize(), []).append(key)
+        for since, keys_since in sorted(stale_by_date.items()):
+            log.info(
+                f"{kind} cache hit for {len(keys_since)} keys, fetching rows since {since}"
+            )
+            fetched_at = self.fetch_time()
+            fresh = fetch_fn(keys_since, since - self.refetch_overlap)
+            for key in keys_since:
+                merged, kept = self.merge(cached[key], fresh[key], watermark_column, since)
+                self.record("hits", fresh[key], self.frame_bytes(kept))
+                self.write(kind, key, merged)
+                self.write_watermark(kind, key, merged, watermark_column, fetched_at)
+                results[key] = merged
+
+        return results
+
+    def get_or_fetch(
+        self, kind: str, key, max_age_seconds: float, fetch_fn: Callable
+    ) -> pd.DataFrame:
+        return self.get_or_fetch_many(
+            kind, [key], max_age_seconds, lambda keys: {key: fetch_fn()}
+        )[key]
+
+    def get_or_fetch_many(
+        self, kind: str, keys: list, max_age_seconds: float, fetch_fn: Callable
+    ) -> dict:
+        """
+        fetch_fn(keys) returns a frame per key. cached frames younger than
+        max_age_seconds are served as is, the rest are fetched together.
+        """
+        results = {}
+        expired = []
+        for key in keys:
+            cached = self.read(kind, key, max_age_seconds)
+            if cached is None:
+                expired.append(key)
+                continue
+            self.record("hits", None, self.frame_bytes(cached))
+            results[key] = cached
+
+        if len(expired) > 0:
+            log.info(f"{kind} cache miss for {len(expired)} keys")
+            fresh = fetch_fn(expired)
+            for key in expired:
+                self.record("misses", fresh[key], 0)
+                self.write(kind, key, fresh[key])
+                results[key] = fresh[key]
+        return results
+
+    def merge(
+        self,
+        cached: pd.DataFrame,
+        fresh: pd.DataFrame,
+        watermark_column: str,
+        since: pd.Timestamp,
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        fresh rows before the watermark's date are the overlap, hours the utc
+        filter cut in two, so the whole cached ones stay. from that date on a
+        timestamp in both keeps the fresh row.
+        """
+        fresh = fresh.loc[pd.to_datetime(fresh[watermark_column]) >= since.normalize()]
+        kept = cached.loc[~cached[watermark_column].isin(fresh[watermark_column])]
+        merged = pd.concat([kept, fresh], ignore_index=True)
+        return merged.sort_values(watermark_column, kind="stable", ignore_index=True), kept
+
+    def read(self, kind: str, key, max_age_seconds: float = None) -> pd.DataFrame:
+        path = self.path(kind, key)
+        if not os.path.exists(path):
+            return None
+        if (
+            max_age_seconds is not None
+            and time.time() - os.path.getmtime(path) > max_age_seconds
+        ):
+            return None
+        return pd.read_parquet(path)
+
+    def read_watermark(
+        self, kind: str, key, cached: pd.DataFrame, watermark_column: str
+    ) -> pd.Timestamp:
+        """
+        None when the key has to be fetched in full. extracts cached before
+        watermarks had a file of their own fall back to their newest row.
+        """
+        if cached is None:
+            return None
+        path = self.path(kind, key, "watermark.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return pd.Timestamp(json.load(f)["watermark"])
+        if cached[watermark_column].count() == 0:
+            return None
+        return pd.Timestamp(cached[watermark_column].max())
+
+    def write_watermark(
+        self,
+        kind: str,
+        key,
+        df: pd.DataFrame,
+        watermark_column: str,
+        fetched_at: pd.Timestamp,
+    ) -> None:
+        """
+        the newest row, or the time of the fetch for a key without rows so it
+        is only asked for what came in since
+        """
+        watermark = fetched_at
+        if df[watermark_column].count() > 0:
+            watermark = pd.Timestamp(df[watermark_column].max())
+        path = self.path(kind, key, "watermark.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"watermark": watermark.isoformat()}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def fetch_time(self) -> pd.Timestamp:
+        # extracts are in local time, a day of overlap covers the offset
+        return pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+    def write(self, kind: str, key, df: pd.DataFrame) -> None:
+        path = self.path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so a crash never leaves a truncated file behind
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+
+    def path(self, kind: str, key, extension: str = "parquet") -> str:
+        return os.path.join(self.directory, kind, f"{key}.{extension}")
+
+    def record(self, outcome: str, fresh: pd.DataFrame, bytes_from_cache: int) -> None:
+        fetched_bytes = self.frame_bytes(fresh) if fresh is not None else 0
+        # extraction threads share one cache
+        with self._stats_lock:
+            self.stats[outcome] += 1
+            self.stats["bytes_from_cache"] += bytes_from_cache
+            if fresh is not None:
+                self.stats["rows_fetched"] += fresh.shape[0]
+                self.stats["bytes_fetched"] += fetched_bytes
+
+    def frame_bytes(self, df: pd.DataFrame) -> int:
+        return int(df.memory_usage(index=False, deep=True).sum())
+
+    def report(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        total_bytes = self.stats["bytes_from_cache"] + self.stats["bytes_fetched"]
+        report = dict(self.stats)
+        report["hit_rate"] = self.stats["hits"] / lookups if lookups else 0
+        report["byte_savings"] = (
+            self.stats["bytes_from_cache"] / total_bytes if total_bytes else 0
+        )
+        log.info(
+            f"extract cache: {report['hits']} hits, {report['misses']} misses, "
+            f"{report['bytes_fetched']} bytes fetched, "
+            f"{report['bytes_from_cache']} bytes served from cache "
+            f"({report['byte_savings']:.1%} saved)"
+        )
+        return report
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_stats_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._stats_lock = threading.Lock()
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "rows_fetched": 0,
+            "bytes_fetched": 0,
+            "bytes_from_cache": 0,
+        }
+        self._stats_lock = threading.Lock()
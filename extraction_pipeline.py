@@ -0,0 +1,89 @@
+import logging
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+
+class ExtractionPipeline:
+    """
+    overlaps warehouse fetches with cleaning. keys are split into batches that a
+    pool of fetch threads pull from the warehouse, each on its own pooled
+    connection, while the calling thread cleans whatever has already arrived.
+
+    fetched batches wait in a bounded queue. once it is full the fetch threads
+    block, so no more than concurrency + queue_size raw batches are held in
+    memory however far the fetches run ahead of the cleaning.
+    """
+
+    concurrency: int
+    queue_size: int
+    # enough batches per thread that the cleaning can start on the first ones early
+    batches_per_worker = 4
+
+    def run(
+        self, keys: list, fetch_fn: Callable, build_fn: Callable, max_batch_size: int
+    ) -> list:
+        """
+        fetch_fn(batch) returns one item per key of the batch and build_fn(item)
+        a list of frames for it. the frames come back in the order of keys,
+        regardless of the order the fetches finish in.
+        """
+        batches = self.split(keys, max_batch_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        cancelled = threading.Event()
+        log.info(
+            f"extracting {len(keys)} keys in {len(batches)} batches over "
+            f"{self.concurrency} threads"
+        )
+
+        def fetch(seq: int, batch: list) -> None:
+            if cancelled.is_set():
+                return
+            try:
+                outcome = (seq, fetch_fn(batch), None)
+            except Exception as e:
+                outcome = (seq, None, e)
+            self.put(results, outcome, cancelled)
+
+        frames_by_seq = {}
+        executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="extract"
+        )
+        try:
+            for seq, batch in enumerate(batches):
+                executor.submit(fetch, seq, batch)
+            for _ in range(len(batches)):
+                seq, items, err = results.get()
+                if err is not None:
+                    raise err
+                frames_by_seq[seq] = [
+                    frame for item in items for frame in build_fn(item)
+                ]
+        finally:
+            # on failure the remaining fetches are dropped instead of waited on
+            cancelled.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return [frame for seq in range(len(batches)) for frame in frames_by_seq[seq]]
+
+    def split(self, keys: list, max_batch_size: int) -> list:
+        batch_size = math.ceil(len(keys) / (self.concurrency * self.batches_per_worker))
+        batch_size = max(1, min(batch_size, max_batch_size))
+        return [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+
+    def put(self, results: queue.Queue, outcome: tuple, cancelled: threading.Event) -> None:
+        # wait for room, unless the consumer has given up and will never make any
+        while not cancelled.is_set():
+            try:
+                results.put(outcome, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __init__(self, concurrency: int, queue_size: int):
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(1, queue_size)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+"""
+dtypes of the assembled training frame. ids and time zones repeat on every
+hourly row, so they are categoricals, and the features are the narrowest type
+that holds them.
+"""
+
+store_attribute_dtypes = {
+    "region_number": "category",
+    "location_number": "category",
+    "is_closed_sunday": np.int8,
+    "summer_hours_open": np.int8,
+    "summer_hours_close": np.int8,
+    "winter_hours_open": np.int8,
+    "winter_hours_close": np.int8,
+    "time_zone": "category",
+}
+
+feature_dtypes = {
+    "date_time": "datetime64[ns]",
+    "condition": "category",
+    "precipitation": np.float32,
+    "car_count": np.float32,
+    "hour": np.int8,
+    "is_holiday": np.int8,
+    "adj_hours": np.int8,
+    "cloud_cover": np.int8,
+    "rain_intensity": np.int8,
+    "sleet_intensity": np.int8,
+    "snow_intensity": np.int8,
+    "ice_intensity": np.int8,
+    "thunder_intensity": np.int8,
+}
+
+
+# per store frames keep condition as strings, per store categoricals with different
+# categories would concat back to object
+store_frame_dtypes = {
+    column: dtype for column, dtype in feature_dtypes.items() if column != "condition"
+}
+
+
+def apply_schema(df: pd.DataFrame, dtypes: dict) -> None:
+    for column, dtype in dtypes.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+
+
+def join_store_attributes(
+    df: pd.DataFrame, stores: pd.DataFrame, n_rows: list
+) -> pd.DataFrame:
+    """
+    df holds the rows of each store in turn, n_rows[i] of them for the store in
+    row i of stores. every store attribute is looked up by key, so the per row
+    cost is a category code or an int8 rather than a tiled python object.
+    """
+    stores = stores.reset_index(drop=True)
+    apply_schema(stores, store_attribute_dtypes)
+    codes = np.repeat(np.arange(stores.shape[0]), n_rows)
+    attributes = {
+        column: stores[column].array.take(codes) for column in stores.columns
+    }
+    return pd.concat(
+        [pd.DataFrame(attributes, index=df.index), df], axis=1, copy=False
+    )
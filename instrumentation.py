@@ -0,0 +1,254 @@
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+class Instrumentation:
+    """
+    records wall time, rows in and out, bytes fetched and peak memory for each
+    stage of a run, per zip, store or region where a stage has a key, and writes
+    them to a JSON run report. disabled, a stage costs one attribute check.
+
+    worker processes inherit the configuration through fork. they spool their
+    records to a directory whenever an outermost stage finishes, and the parent
+    merges them into the report.
+
+    with a profile directory set, every outermost stage on a main thread is run
+    under cProfile and dumped as <stage>-<pid>-<n>.prof: the whole run in the
+    parent, each region or store batch in the workers.
+    """
+
+    enabled: bool
+    report_file: str
+    trace_memory: bool
+    profile_dir: str
+    spool_dir: str
+    records: list
+    pid: int
+
+    def configure(
+        self, report_file: str, trace_memory: bool = False, profile_dir: str = None
+    ) -> None:
+        self.enabled = report_file is not None
+        self.report_file = report_file
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.records = []
+        self.pid = os.getpid()
+        self._records_pid = self.pid
+        if not self.enabled:
+            return
+        self.spool_dir = tempfile.mkdtemp(prefix="weather_analytics_report_")
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        log.info(f"instrumenting run, report will be written to {report_file}")
+
+    @contextmanager
+    def stage(self, name: str, key=None, rows_in: int = None):
+        """
+        yields the stage's record, callers may fill in rows_out, bytes or any
+        other figure they have
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        state = self.thread_state()
+        on_main_thread = threading.current_thread() is threading.main_thread()
+        outermost = len(state.peaks) == 0
+        record = {
+            "stage": name,
+            "key": None if key is None else str(key),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "rows_in": rows_in,
+            "rows_out": None,
+            "bytes": None,
+        }
+
+        trace = self.trace_memory and on_main_thread and tracemalloc.is_tracing()
+        if trace:
+            # fold the peak so far into the enclosing stage before resetting it
+            if len(state.peaks) > 0:
+                state.peaks[-1] = max(state.peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        state.peaks.append(0)
+
+        profiler = None
+        if outermost and on_main_thread and self.profile_dir is not None:
+            profiler = cProfile.Profile()
+            self._profiler = profiler
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            peak = state.peaks.pop()
+            if trace:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                record["traced_peak_bytes"] = peak
+                if len(state.peaks) > 0:
+                    state.peaks[-1] = max(state.peaks[-1], peak)
+            # linux reports kilobytes
+            record["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            if profiler is not None:
+                profiler.disable()
+                self._profiler = None
+                state.profiles += 1
+                record["profile"] = os.path.join(
+                    self.profile_dir, f"{name}-{os.getpid()}-{state.profiles}.prof"
+                )
+                profiler.dump_stats(record["profile"])
+            self.add(record, outermost)
+
+    def timed(self, name: str, key: str = None):
+        """
+        decorator running the function as a stage. key names the argument that
+        identifies the zip, store or region, a list of them is recorded as its
+        length. a returned frame, or dict of frames, is counted as rows_out and
+        bytes.
+        """
+
+        def decorator(fn):
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                key_value = None
+                if key is not None:
+                    key_value = signature.bind_partial(*args, **kwargs).arguments.get(key)
+                    if isinstance(key_value, (list, tuple)):
+                        key_value = f"{len(key_value)} keys"
+                with self.stage(name, key_value) as record:
+                    result = fn(*args, **kwargs)
+                    self.count(record, result)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def count(self, record: dict, result) -> None:
+        frames = []
+        if isinstance(result, pd.DataFrame):
+            frames = [result]
+        elif isinstance(result, dict):
+            frames = [v for v in result.values() if isinstance(v, pd.DataFrame)]
+        if len(frames) > 0:
+            record["rows_out"] = sum(frame.shape[0] for frame in frames)
+            record["bytes"] = int(
+                sum(frame.memory_usage(index=False, deep=True).sum() for frame in frames)
+            )
+
+    def add(self, record: dict, outermost: bool) -> None:
+        with self._lock:
+            if self._records_pid != os.getpid():
+                # a forked worker starts with a copy of the parent's records
+                self.records = []
+                self._records_pid = os.getpid()
+            self.records.append(record)
+            if outermost and os.getpid() != self.pid:
+                with open(os.path.join(self.spool_dir, f"{os.getpid()}.jsonl"), "a") as f:
+                    for r in self.records:
+                        f.write(json.dumps(r) + "\n")
+                self.records = []
+
+    def thread_state(self) -> threading.local:
+        state = self._local
+        if getattr(state, "pid", None) != os.getpid():
+            # first stage of this thread, or of a forked worker inside the parent's stage
+            state.pid = os.getpid()
+            state.peaks = []
+            state.profiles = 0
+            if self._profiler is not None and os.getpid() != self.pid:
+                self._profiler.disable()
+                self._profiler = None
+        return state
+
+    def report(self) -> dict:
+        records = list(self.records)
+        for spool_file in sorted(os.listdir(self.spool_dir)):
+            with open(os.path.join(self.spool_dir, spool_file)) as f:
+                records.extend(json.loads(line) for line in f)
+
+        stages = {}
+        for r in records:
+            s = stages.setdefault(
+                r["stage"],
+                {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "rows_in": 0,
+                    "rows_out": 0,
+                    "bytes": 0,
+                    "max_rss_bytes": 0,
+                },
+            )
+            s["calls"] += 1
+            s["seconds"] += r["seconds"]
+            s["max_seconds"] = max(s["max_seconds"], r["seconds"])
+            s["rows_in"] += r["rows_in"] or 0
+            s["rows_out"] += r["rows_out"] or 0
+            s["bytes"] += r["bytes"] or 0
+            s["max_rss_bytes"] = max(s["max_rss_bytes"], r["max_rss_bytes"])
+            if "traced_peak_bytes" in r:
+                s["traced_peak_bytes"] = max(s.get("traced_peak_bytes", 0), r["traced_peak_bytes"])
+        return {
+            "written_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "stages": stages,
+            "records": records,
+        }
+
+    def write_report(self) -> None:
+        if not self.enabled:
+            return
+        report = self.report()
+        with open(f"{self.report_file}.tmp", "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(f"{self.report_file}.tmp", self.report_file)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+        for name, s in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            log.info(
+                f"stage {name}: {s['calls']} calls, {s['seconds']:.2f}s, "
+                f"{s['rows_out']} rows out, {s['bytes']} bytes"
+            )
+        log.info(f"wrote run report to {self.report_file}")
+
+    def __init__(self):
+        self.enabled = False
+        self.report_file = None
+        self.trace_memory = False
+        self.profile_dir = None
+        self.spool_dir = None
+        self.records = []
+        self.pid = os.getpid()
+        self._records_pid = self.pid
+        self._profiler = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+
+# one per process, configured by main.run and inherited by forked workers
+instruments = Instrumentation()
@@ -4,14 +4,24 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 from multiprocessing import Pool
+from functools import partial
 from itertools import cycle
 
 
 from config import Config
-from data_warehouse import RedshiftDW
+from data_warehouse import RedshiftDW, bulk_query_chunk_size
 from elastic_net_model import ElasticNetModel, regressors, predictor
 from weather_dictionaries import *
-from data_cleanup import clean_data
+from data_cleanup import clean_weather, clean_store_data
+from condition_lexicon import lexicon
+from frame_schema import apply_schema, feature_dtypes, store_frame_dtypes, join_store_attributes
+from execution_budget import ExecutionBudget, limit_worker_threads, region_worker_pool
+from shared_dataset import SharedDataset, DatasetSlice
+from extraction_pipeline import ExtractionPipeline
+from result_sink import ResultSink
+from instrumentation import instruments
+from store_fitting import FitCheckpoint, pack_store_batches
+from retraining import FingerprintStore, RetrainPlan
 
 log = logging.getLogger(__name__)
 
@@ -41,108 +51,384 @@ colors = [
         mcolors.CSS4_COLORS["orange"],
         ]
 
-def create_store_info_df(store_info: pd.Series, num_rows: int) -> pd.DataFrame:
-    store_info_keys = store_info.keys()
-    df = pd.DataFrame(
-        [store_info.loc[store_info_keys[0]]], columns=[store_info_keys[0]]
+def build_store_frame(
+    weather: pd.DataFrame, store: pd.Series, orders: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    store_data = [x | Y]
+
+    weather has been through clean_weather, once for every store in its zip
+    code. store attributes are joined back by key in assemble_store_frames.
+    """
+    with instruments.stage("build_store_frame", store["location_number"]) as record:
+        record["rows_in"] = weather.shape[0]
+        data = clean_store_data(weather, store, orders)
+        apply_schema(data, store_frame_dtypes)
+        record["rows_out"] = data.shape[0]
+    return data
+
+
+def assemble_store_frames(store_frames: list) -> pd.DataFrame:
+    """
+    store_frames holds a (store, frame) pair per store
+    """
+    # one concat over every store instead of re-copying the running total per store
+    if len(store_frames) == 0:
+        return pd.DataFrame([])
+    frames = [frame for _, frame in store_frames]
+    all_data = pd.concat(frames, ignore_index=True)
+    apply_schema(all_data, feature_dtypes)
+    return join_store_attributes(
+        all_data,
+        pd.DataFrame([store for store, _ in store_frames]),
+        [frame.shape[0] for frame in frames],
     )
-    for i in range(1, len(store_info_keys)):
-        df.insert(df.shape[1], store_info_keys[i], store_info.loc[store_info_keys[i]])
 
-    return pd.DataFrame(np.tile(df.values, [num_rows, 1]), columns=df.columns)
 
+@instruments.timed("fetch_zip_batch", key="zipcodes")
+def fetch_zip_batch(dw: RedshiftDW, zipcodes: list, extract_mode: str = "bulk") -> list:
+    """
+    returns (weather, stores, orders by location number) for each zip code, in
+    the order of zipcodes
+    """
+    if extract_mode == "bulk":
+        weather_by_zip = dw.get_historic_weather_by_zip_codes(zipcodes)
+        stores_by_zip = dw.get_stores_by_zip_codes(zipcodes)
+        orders_by_store = dw.get_orders_by_store_numbers(
+            [
+                location_number
+                for stores in stores_by_zip.values()
+                for location_number in stores["location_number"].tolist()
+            ]
+        )
+        get_weather = weather_by_zip.__getitem__
+        get_stores = stores_by_zip.__getitem__
+        get_orders = orders_by_store.__getitem__
+    else:
+        get_weather = dw.get_historic_weather_by_zip_code
+        get_stores = dw.get_stores_by_zip_code
+        get_orders = dw.get_orders_by_store_number
 
-def get_store_data(dw: RedshiftDW):
-    all_data = pd.DataFrame([])
-    zips = dw.get_distinct_zip_codes_for_stores()
-    for row in zips.iterrows():
-        zipcode = row[1]["zip_code"]
+    items = []
+    for zipcode in zipcodes:
         """
         weather is x = x_n-1: weather conditions + x_n: datetime
         """
-        weather = dw.get_historic_weather_by_zip_code(zipcode)
+        weather = get_weather(zipcode)
         """
         stores is region_number + location_number + store_hyperparameters
         """
-        stores = dw.get_stores_by_zip_code(zipcode)
-        for store in stores.iterrows():
-            """
-            orders is y = cars per hour
-            orders.datetime
-            orders.carcount
-            """
-            orders = dw.get_orders_by_store_number(store[1]["location_number"])
-            """
-            store_data = [x | Y]
-            """
-            data = pd.merge(weather, orders, how="left", on="date_time")
-            store_info_df = create_store_info_df(store[1], data.shape[0])
-            for column in data.columns:
-                store_info_df.insert(len(store_info_df.columns), column, data[column])
-
-            clean_data(store_info_df)
-
-            if len(all_data.columns) == 0:
-                all_data = store_info_df.copy()
-            else: 
-                all_data = pd.concat([all_data, store_info_df], ignore_index=True)
-    return all_data
-
-
-def fit_stores(dw: RedshiftDW, location_number: str, data: pd.DataFrame):
+        stores = get_stores(zipcode)
+        """
+        orders is y = cars per hour
+        orders.datetime
+        orders.carcount
+        """
+        orders = {
+            location_number: get_orders(location_number)
+            for location_number in stores["location_number"].tolist()
+        }
+        items.append((weather, stores, orders))
+    return items
+
+
+def build_zip_frames(item: tuple) -> list:
+    weather, stores, orders = item
+    clean_weather(weather)
+    return [
+        (store[1], build_store_frame(weather, store[1], orders[location_number]))
+        for location_number, store in zip(
+            stores["location_number"].tolist(), stores.iterrows()
+        )
+    ]
+
+
+def get_warehouse_store_data(dw: RedshiftDW, zipcodes: list) -> pd.DataFrame:
+    """
+    the warehouse hands back model ready rows, only the dtypes and the store
+    attributes are applied here
+    """
+    stores_by_zip = dw.get_stores_by_zip_codes(zipcodes)
+    stores = [store for zipcode in zipcodes for _, store in stores_by_zip[zipcode].iterrows()]
+    features = dw.fetch_store_features_by_store_numbers(
+        [store["location_number"] for store in stores]
+    )
+    store_frames = []
+    for store in stores:
+        data = features[store["location_number"]]
+        apply_schema(data, store_frame_dtypes)
+        store_frames.append((store, data))
+    return assemble_store_frames(store_frames)
+
+
+@instruments.timed("get_store_data")
+def get_store_data(
+    dw: RedshiftDW,
+    extract_mode: str = "bulk",
+    concurrency: int = 0,
+    queue_size: int = 8,
+    feature_mode: str = "local",
+):
+    zips = dw.get_distinct_zip_codes_for_stores()
+    # tolist() hands back python scalars, which psycopg2 can bind
+    zipcodes = zips["zip_code"].tolist()
+    if feature_mode == "warehouse":
+        return get_warehouse_store_data(dw, zipcodes)
+    fetch = partial(fetch_zip_batch, dw, extract_mode=extract_mode)
+
+    if concurrency == 0:
+        store_frames = [
+            frame for item in fetch(zipcodes) for frame in build_zip_frames(item)
+        ]
+        return assemble_store_frames(store_frames)
+
+    if dw.pool_size > 0 and concurrency > dw.pool_size:
+        log.warning(
+            f"extract concurrency {concurrency} exceeds the connection pool size, "
+            f"limiting it to {dw.pool_size}"
+        )
+        concurrency = dw.pool_size
+    # bulk fetches a batch of zips per round trip, per_key one zip per task
+    max_batch_size = bulk_query_chunk_size if extract_mode == "bulk" else 1
+    pipeline = ExtractionPipeline(concurrency, queue_size)
+    store_frames = pipeline.run(zipcodes, fetch, build_zip_frames, max_batch_size)
+    return assemble_store_frames(store_frames)
+
+
+def get_model_options(config: Config, budget: ExecutionBudget) -> dict:
+    return {
+        "search_strategy": config.en_search_strategy,
+        "mae_tolerance": config.en_mae_tolerance,
+        "n_jobs": budget.cv_jobs,
+        "blas_threads": budget.blas_threads,
+    }
+
+
+@instruments.timed("fit_store", key="location_number")
+def fit_stores(location_number: str, data: pd.DataFrame, model_options: dict = None) -> tuple:
     log.info(f"fitting elastic net model for store {location_number}")
-    m = ElasticNetModel(data)
+    m = ElasticNetModel(data, **(model_options or {}))
     m.tune_model()
-    dw.set_store_elastic_net_values(location_number, m.l1_ratio, m.alpha, m.mae)
+    # the parent writes every store's result back in one batch
+    return location_number, m.l1_ratio, m.alpha, m.mae
 
 
 def plot_and_coefficient_vals(m: ElasticNetModel, region_number: str) -> None:
     log.info(f"plotting coefficient values for region {region_number}")
     coefficient_values = m.coefficients
-    fig = plt.figure()
-    fig.bar(labels, coefficient_values, label=labels, color=colors)
-    fig.title(f"Elastic-Net Coefficients for Region {region_number}")
-    fig.legend()
+    fig, ax = plt.subplots()
+    ax.bar(labels, coefficient_values, label=labels, color=colors)
+    ax.set_title(f"Elastic-Net Coefficients for Region {region_number}")
+    ax.legend()
     fig.savefig(f"./images/vals/region_{region_number}_coefficient_values.png", format='png')
+    # workers plot every region they fit, open figures would pile up
+    plt.close(fig)
 
 
 def plot_and_save_coefficient_path(m: ElasticNetModel, region_number: str) -> None:
     log.info(f"plotting coefficient path for region {region_number}")
     alphas, coeffs = m.coefficient_path()
-    fig = plt.figure()
+    fig, ax = plt.subplots()
     for coef, c, label in zip(coeffs[0], cycle(colors), labels):
-        fig.semilogx(alphas, coef, linestyle="-", c=c, label=label)
+        ax.semilogx(alphas, coef, linestyle="-", c=c, label=label)
         
-    fig.axvline(x=m.alpha, ymin=-0.5, ymax=3.5, label='Optimal Alpha', linestyle='--', c=mcolors.CSS4_COLORS["khaki"])
-    fig.xlabel("alpha")
-    fig.ylabel("coefficients")
-    fig.title(f"Elastic-Net Coefficient Paths for Region {region_number}")
-    fig.legend()
+    ax.axvline(x=m.alpha, ymin=-0.5, ymax=3.5, label='Optimal Alpha', linestyle='--', c=mcolors.CSS4_COLORS["khaki"])
+    ax.set_xlabel("alpha")
+    ax.set_ylabel("coefficients")
+    ax.set_title(f"Elastic-Net Coefficient Paths for Region {region_number}")
+    ax.legend()
     fig.savefig(f"./images/paths/coeff_path_region_{region_number}.png", format='png')
+    plt.close(fig)
 
 
-def fit_region(dw: RedshiftDW, region_number: str, data: pd.DataFrame) -> None:
+@instruments.timed("fit_region", key="region_number")
+def fit_region(region_number: str, data: pd.DataFrame, model_options: dict = None) -> tuple:
     log.info(f"fitting elastic net model for region {region_number}")
-    m = ElasticNetModel(data)
+    m = ElasticNetModel(data, **(model_options or {}))
     m.tune_model()
     # plot_and_save_coefficient_path(m, region_number)
     plot_and_coefficient_vals(m, region_number)
-    dw.set_region_coefficient_vals(m, region_number)
+    # the parent writes every region's result back in one batch
+    return region_number, m.coefficients, m.l1_ratio, m.alpha
+
+
+def fit_region_slice(region_number: str, data_slice: DatasetSlice, model_options: dict = None) -> tuple:
+    return fit_region(region_number, data_slice.load(), model_options)
+
+
+def remove_untrainable(n_rows: dict, kind: str) -> None:
+    """
+    drops the keys whose row count ElasticNetModel would refuse, a model without
+    training data fails inside the worker and takes its whole batch down
+    """
+    too_small = [key for key, rows in n_rows.items() if not ElasticNetModel.has_enough_rows(rows)]
+    if len(too_small) > 0:
+        log.warning(f"skipping {len(too_small)} {kind} with too few rows to cross validate")
+        for key in too_small:
+            del n_rows[key]
+
+
+def fit_region_dataset(config: Config, dataset: SharedDataset, sink: ResultSink, plan: RetrainPlan = None) -> None:
+    budget = ExecutionBudget(config.cpu_budget, config.region_workers, config.cv_jobs)
+    model_options = get_model_options(config, budget)
+    region_numbers = plan.to_fit(dataset.ranges) if plan is not None else list(dataset.ranges)
+    region_rows = {
+        region_number: dataset.slice(region_number).n_rows for region_number in region_numbers
+    }
+    remove_untrainable(region_rows, "regions")
+    region_numbers = list(region_rows)
+    region_items = [
+        (
+            region_number,
+            dataset.slice(region_number),
+            plan.model_options(region_number, model_options) if plan is not None else model_options,
+        )
+        for region_number in region_numbers
+    ]
+    # largest regions first, so the slowest fits are not left running alone at the end
+    region_items.sort(key=lambda item: item[1].n_rows, reverse=True)
+
+    with region_worker_pool(budget) as pool:
+        # regions are handed out one at a time, in sorted order, as workers free up
+        region_results = list(pool.map(fit_region_slice, *zip(*region_items)))
+
+    for region_number, coefficients, l1_ratio, alpha in region_results:
+        sink.add_region_coefficients(region_number, coefficients)
+        if plan is not None:
+            plan.record(region_number, l1_ratio, alpha)
+
+
+def fit_store_dataset(
+    config: Config,
+    dataset: SharedDataset,
+    sink: ResultSink,
+    checkpoint: FitCheckpoint = None,
+    plan: RetrainPlan = None,
+) -> None:
+    # store fits are small, so one worker per cpu with serial cross validation
+    budget = ExecutionBudget(config.cpu_budget, config.cpu_budget, 1)
+    model_options = get_model_options(config, budget)
+    model_options["search_strategy"] = config.store_search_strategy
+
+    # copied, the checkpoint keeps recording into its own dict as stores finish
+    finished = dict(checkpoint.results) if checkpoint is not None else {}
+    location_numbers = plan.to_fit(dataset.ranges) if plan is not None else list(dataset.ranges)
+    store_rows = {
+        location_number: dataset.slice(location_number).n_rows
+        for location_number in location_numbers
+        if location_number not in finished
+    }
+    remove_untrainable(store_rows, "stores")
+
+    batches = pack_store_batches(store_rows, config.store_batch_rows)
+    log.info(
+        f"fitting {len(store_rows)} stores in {len(batches)} batches, "
+        f"{len(finished)} already finished"
+    )
+    store_batches = [
+        [
+            (
+                location_number,
+                dataset.slice(location_number),
+                plan.model_options(location_number, model_options) if plan is not None else model_options,
+            )
+            for location_number in batch
+        ]
+        for batch in batches
+    ]
+    with Pool(
+        budget.region_workers,
+        initializer=limit_worker_threads,
+        initargs=(budget.blas_threads,),
+    ) as pool:
+        for results in pool.imap_unordered(fit_store_batch, store_batches):
+            if checkpoint is not None:
+                checkpoint.record(results)
+            for result in results:
+                sink.add_store_parameters(*result)
+                if plan is not None:
+                    plan.record(result[0], result[1], result[2])
+
+    for result in finished.values():
+        sink.add_store_parameters(*result)
+        # the checkpoint may hold stores the current data no longer has
+        if plan is not None and result[0] in plan.fingerprints:
+            plan.record(result[0], result[1], result[2])
+
+
+@instruments.timed("fit_store_batch", key="store_slices")
+def fit_store_batch(store_slices: list) -> list:
+    return [
+        fit_stores(location_number, data_slice.load(), model_options)
+        for location_number, data_slice, model_options in store_slices
+    ]
 
 
 def run():
     config = Config()
+    instruments.configure(config.run_report_file, config.profile_memory, config.profile_dir)
+    if config.condition_lexicon_file:
+        lexicon.load(config.condition_lexicon_file)
+    try:
+        with instruments.stage("run"):
+            train(config)
+    finally:
+        instruments.write_report()
+
+
+def train(config: Config):
     dw = RedshiftDW(config)
-    store_data = get_store_data(dw)
+    try:
+        store_data = get_store_data(
+            dw,
+            config.extract_mode,
+            config.extract_concurrency,
+            config.extract_queue_size,
+            config.feature_mode,
+        )
+        if dw.cache is not None:
+            dw.cache.report()
+        lexicon.report()
+
+        fingerprints = None
+        plan = None
+        group_column = "location_number" if config.fit_mode == "store" else "region_number"
+        if config.fingerprint_file:
+            fingerprints = FingerprintStore(config.fingerprint_file)
+            plan = fingerprints.plan(config.fit_mode, store_data, group_column, regressors+predictor)
+            if config.fit_mode == "store":
+                # the warehouse holds the current store hyperparameters, the fingerprint file a copy
+                store_params = dw.get_store_hyperparameters(list(plan.warm_starts))
+                plan.warm_starts.update(store_params)
+    finally:
+        # the fits never touch the warehouse, release the connections until the results are written
+        dw.close_pool()
+
+    # workers map their rows from one shared file instead of receiving pickled slices
+    dataset = SharedDataset(store_data, group_column, regressors+predictor, config.shared_data_dir)
+    del store_data
+
+    sink = ResultSink()
+    checkpoint = None
+    if config.fit_mode == "store" and config.checkpoint_file:
+        checkpoint = FitCheckpoint(config.checkpoint_file)
+    try:
+        if config.fit_mode == "store":
+            fit_store_dataset(config, dataset, sink, checkpoint, plan)
+        else:
+            fit_region_dataset(config, dataset, sink, plan)
+    finally:
+        dataset.close()
 
-    # store_items = [(dw, location_number, store_data.loc[store_data["location_number"] == location_number, regressors+predictor]) for location_number in store_data.location_number.unique()]
-    region_items = [(dw, region_number, store_data.loc[store_data["region_number"] == region_number, regressors+predictor]) for region_number in store_data.region_number.unique()]
+    try:
+        sink.flush(dw)
+    finally:
+        dw.close_pool()
+    if fingerprints is not None:
+        fingerprints.save(config.fit_mode, plan)
+    if checkpoint is not None:
+        checkpoint.remove()
 
-    # with Pool(6) as pool:
-    #     pool.starmap(fit_stores, store_items)
-    with Pool(6) as pool:
-        pool.starmap(fit_region, region_items)
-    
 
 if __name__ == "__main__":
     run()
@@ -14,8 +14,15 @@ rollback = """
 rollback;
 """
 
+health_check = """
+select 1;
+"""
+
 """
 GETTERS
+
+parameters are named and bound by psycopg2, the bulk variants take a tuple of
+keys for their in list
 """
 get_orders_by_store_number = """
 select 
@@ -26,9 +33,9 @@ from
 inner join 
     dw.dim_locations dl on o.location_id = dl.location_id
 where 
-    o.created_at >= '{}'::date
+    o.created_at >= %(time_period_start)s::date
 and
-    o.created_at < '{}'::date
+    o.created_at < %(time_period_end)s::date
 and
     o.deleted_at is null
 and
@@ -36,7 +43,7 @@ and
 and
     o.service_item_id is not null
 and
-    dl.location_number = '{}'
+    dl.location_number = %(location_number)s
 group by 1
 order by 1
 """
@@ -57,7 +64,7 @@ join
 on
     wsp.location_number = loc.location_number
 where
-    loc.zip_code = {}
+    loc.zip_code = %(zip_code)s
 """
 
 get_historic_weather_for_zip_code = """
@@ -68,33 +75,129 @@ select
 from 
     dw.weather 
 where 
-    zip_code = {} 
+    zip_code = %(zip_code)s
 and 
     condition_text is not NULL
+and
+    weather_date <= %(last_weather_date)s::date
 order by
     weather_date asc
 """
 
-get_distinct_zip_codes = """
-select distinct
-    zip_code
-from
-    dw.dim_locations
+get_stores_by_zipcodes = """
+select 
+    loc.zip_code,
+    loc.region_number,
+    wsp.location_number,
+    wsp.is_closed_sunday,
+    wsp.summer_hours_open,
+    wsp.summer_hours_close,
+    wsp.winter_hours_open,
+    wsp.winter_hours_close,
+    wsp.time_zone
+from 
+    public.weather_iq_store_parameters as wsp
+join
+    dw.dim_locations as loc
+on
+    wsp.location_number = loc.location_number
+where
+    loc.zip_code in %(zip_codes)s
+order by
+    loc.zip_code
+"""
+
+get_historic_weather_for_zip_codes = """
+select 
+    zip_code,
+    weather_date,
+    condition_text,
+    total_precipitation
+from 
+    dw.weather 
+where 
+    zip_code in %(zip_codes)s
+and 
+    condition_text is not NULL
+and
+    weather_date <= %(last_weather_date)s::date
+order by
+    zip_code asc,
+    weather_date asc
+"""
+
+get_orders_by_store_numbers = """
+select 
+    dl.location_number,
+    date_trunc('hour', convert_timezone('UTC', dl.timezone_id, o.created_at)) as date_time,
+    count(distinct o.order_id) as car_count 
+from 
+    dw.orders o
+inner join 
+    dw.dim_locations dl on o.location_id = dl.location_id
+where 
+    o.created_at >= %(time_period_start)s::date
+and
+    o.created_at < %(time_period_end)s::date
+and
+    o.deleted_at is null
+and
+    o.is_business_hours = 'true'
+and
+    o.service_item_id is not null
+and
+    dl.location_number in %(location_numbers)s
+group by 1, 2
+order by 1, 2
+"""
+
+get_historic_weather_for_zip_code_since = """
+select 
+    weather_date,
+    condition_text,
+    total_precipitation
+from 
+    dw.weather 
+where 
+    zip_code = %(zip_code)s
+and 
+    weather_date >= %(since)s::date
+and 
+    condition_text is not NULL
+and
+    weather_date <= %(last_weather_date)s::date
+order by
+    weather_date asc
 """
 
-get_weather_for_zip = """
+get_historic_weather_for_zip_codes_since = """
 select 
-    weather_date, 
-    condition_text, 
-    total_precipitation 
+    zip_code,
+    weather_date,
+    condition_text,
+    total_precipitation
 from 
     dw.weather 
 where 
-    zip_code = {} and condition_text is not NULL 
-order by 
+    zip_code in %(zip_codes)s
+and 
+    weather_date >= %(since)s::date
+and 
+    condition_text is not NULL
+and
+    weather_date <= %(last_weather_date)s::date
+order by
+    zip_code asc,
     weather_date asc
 """
 
+get_distinct_zip_codes = """
+select distinct
+    zip_code
+from
+    dw.dim_locations
+"""
+
 get_store_params = """
 select 
     is_closed_sunday, 
@@ -109,63 +212,259 @@ select
 from 
     public.weather_iq_store_parameters 
 where 
-    location_number = {}
+    location_number = %(location_number)s
 """
 
-get_car_count_for_store = """
-select 
-    date_trunc('hour', convert_timezone('UTC', dl.timezone_id, o.created_at)) as date_time,
-    count(distinct o.order_id) as car_count 
-from 
-    dw.orders o
-inner join 
-    dw.dim_locations dl on o.location_id = dl.location_id
-where 
-    o.created_at >= '{}'::date
+get_store_hyperparameters_by_store_numbers = """
+select
+    location_number,
+    l1_ratio,
+    alpha
+from
+    public.weather_iq_store_parameters
+where
+    location_number in %(location_numbers)s
 and
-    o.created_at < '{}'::date
+    l1_ratio is not null
 and
-    o.deleted_at is null
+    alpha is not null
+"""
+
+"""
+WAREHOUSE FEATURES
+
+the model ready rows built in redshift, matching data_cleanup: daily weather
+expanded to hours, the condition mapped through the condition lexicon table,
+business hours by daylight saving time, holiday flags and the hourly orders.
+a day is on daylight saving time when its midnight has a different utc offset
+from the year's first midnight, as in business_calendar.is_dst. conditions
+are stripped of every character str.strip() removes, trim only takes spaces.
+it sticks to sql that postgres runs as well, so it can be checked against
+data_cleanup on a postgres database.
+"""
+drop_condition_lexicon_table = """
+drop table if exists weather_condition_lexicon;
+"""
+
+create_condition_lexicon_table = """
+create temp table weather_condition_lexicon (
+    condition varchar(256),
+    cloud_cover smallint,
+    rain_intensity smallint,
+    sleet_intensity smallint,
+    snow_intensity smallint,
+    ice_intensity smallint,
+    thunder_intensity smallint
+);
+"""
+
+insert_condition_lexicon_rows = """
+insert into
+    weather_condition_lexicon (
+        condition,
+        cloud_cover,
+        rain_intensity,
+        sleet_intensity,
+        snow_intensity,
+        ice_intensity,
+        thunder_intensity
+    )
+values %s
+"""
+
+get_store_features_by_store_numbers = """
+with digits as (
+    select 0 as digit union all select 1 union all select 2 union all select 3
+    union all select 4 union all select 5 union all select 6 union all select 7
+    union all select 8 union all select 9
+),
+hours_of_day as (
+    select
+        tens.digit * 10 + ones.digit as hour_of_day
+    from
+        digits as tens
+    cross join
+        digits as ones
+    where
+        tens.digit * 10 + ones.digit < 24
+),
+stores as (
+    select
+        wsp.location_number,
+        loc.zip_code,
+        wsp.time_zone,
+        wsp.is_closed_sunday,
+        wsp.summer_hours_open,
+        wsp.summer_hours_close,
+        wsp.winter_hours_open,
+        wsp.winter_hours_close
+    from
+        public.weather_iq_store_parameters as wsp
+    join
+        dw.dim_locations as loc
+    on
+        wsp.location_number = loc.location_number
+    where
+        wsp.location_number in %(location_numbers)s
+),
+store_days as (
+    select
+        s.location_number,
+        w.weather_date,
+        lower(btrim(w.condition_text, %(whitespace)s)) as condition,
+        coalesce(w.total_precipitation, 0) / 24.0 as precipitation,
+        convert_timezone(s.time_zone, 'UTC', w.weather_date::timestamp)
+            - w.weather_date::timestamp
+        <> convert_timezone(s.time_zone, 'UTC', date_trunc('year', w.weather_date::timestamp))
+            - date_trunc('year', w.weather_date::timestamp) as is_dst,
+        s.summer_hours_open,
+        s.summer_hours_close,
+        s.winter_hours_open,
+        s.winter_hours_close,
+        coalesce(s.is_closed_sunday, false) and extract(dow from w.weather_date) = 0 as is_closed
+    from
+        stores as s
+    join
+        dw.weather as w
+    on
+        w.zip_code = s.zip_code
+    where
+        w.condition_text is not NULL
+    and
+        w.weather_date <= %(last_weather_date)s::date
+),
+local_orders as (
+    select
+        dl.location_number,
+        o.order_id,
+        date_trunc('hour', convert_timezone('UTC', dl.timezone_id, o.created_at)) as date_time
+    from
+        dw.orders o
+    inner join
+        dw.dim_locations dl on o.location_id = dl.location_id
+    where
+        o.created_at >= %(time_period_start)s::date
+    and
+        o.created_at < %(time_period_end)s::date
+    and
+        o.deleted_at is null
+    and
+        o.is_business_hours = 'true'
+    and
+        o.service_item_id is not null
+    and
+        dl.location_number in %(location_numbers)s
+),
+hourly_orders as (
+    select
+        location_number,
+        date_time,
+        date_time::date as order_date,
+        extract(hour from date_time)::int as hour_of_day,
+        count(distinct order_id) as car_count
+    from
+        local_orders
+    group by 1, 2, 3, 4
+)
+select
+    d.location_number,
+    o.date_time,
+    d.condition,
+    d.precipitation,
+    o.car_count,
+    h.hour_of_day as hour,
+    case when d.weather_date in %(holiday_dates)s then 1 else 0 end as is_holiday,
+    case when d.weather_date in %(adj_hours_dates)s then 1 else 0 end as adj_hours,
+    coalesce(c.cloud_cover, 0) as cloud_cover,
+    coalesce(c.rain_intensity, 0) as rain_intensity,
+    coalesce(c.sleet_intensity, 0) as sleet_intensity,
+    coalesce(c.snow_intensity, 0) as snow_intensity,
+    coalesce(c.ice_intensity, 0) as ice_intensity,
+    coalesce(c.thunder_intensity, 0) as thunder_intensity
+from
+    store_days as d
+cross join
+    hours_of_day as h
+join
+    hourly_orders as o
+on
+    o.location_number = d.location_number
 and
-    o.is_business_hours = 'true'
+    o.order_date = d.weather_date
 and
-    o.service_item_id is not null
+    o.hour_of_day = h.hour_of_day
+left join
+    weather_condition_lexicon as c
+on
+    c.condition = d.condition
+where
+    not d.is_closed
 and
-    dl.location_number = '{}'
-group by 1
-order by 1
- """
+    h.hour_of_day >= case when d.is_dst then d.summer_hours_open else d.winter_hours_open end
+and
+    h.hour_of_day < case when d.is_dst then d.summer_hours_close else d.winter_hours_close end
+order by
+    d.location_number,
+    o.date_time
+"""
 
 '''
 SETTERS
 '''
-update_store_en_fields = """
+create_store_parameters_staging = """
+create temp table store_parameters_staging (
+    location_number varchar(256),
+    l1_ratio float8,
+    alpha float8,
+    en_mae float8
+);
+"""
+
+drop_store_parameters_staging = """
+drop table if exists store_parameters_staging;
+"""
+
+insert_store_parameters_staging = """
+insert into
+    store_parameters_staging (location_number, l1_ratio, alpha, en_mae)
+values %s
+"""
+
+update_store_en_fields_from_staging = """
 update
     public.weather_iq_store_parameters
 set
-    l1_ratio = {},
-    alpha = {},
-    en_mae = {},
+    l1_ratio = s.l1_ratio,
+    alpha = s.alpha,
+    en_mae = s.en_mae,
     updated_at = getdate()
+from
+    store_parameters_staging s
 where
-    location_number = '{}';
+    public.weather_iq_store_parameters.location_number = s.location_number;
 """
 
-insert_region_coefficient_fields = """
+insert_region_coefficient_rows = """
 insert into
-    public.weather_analytics_region_coefficients
-values
-    region_number = {},
-    hour_coefficient = {},
-    precipitation_coefficient = {},
-    is_holiday_coefficient = {},
-    adj_hours_coefficeint = {},
-    cloud_cover_coefficient = {},
-    rain_intensity_coefficient = {},
-    sleet_intensity_coefficient = {},
-    snow_intensity_coefficient = {},
-    ice_intensity_coefficient = {},
-    thunder_intensity_coefficient = {},
-    created_at = getdate(),
-    updated_at = getdate()
-"""
\ No newline at end of file
+    public.weather_analytics_region_coefficients (
+        region_number,
+        hour_coefficient,
+        precipitation_coefficient,
+        is_holiday_coefficient,
+        adj_hours_coefficeint,
+        cloud_cover_coefficient,
+        rain_intensity_coefficient,
+        sleet_intensity_coefficient,
+        snow_intensity_coefficient,
+        ice_intensity_coefficient,
+        thunder_intensity_coefficient,
+        created_at,
+        updated_at
+    )
+values %s
+"""
+
+# one row of insert_region_coefficient_rows for execute_values
+region_coefficient_row_template = (
+    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, getdate(), getdate())"
+)
@@ -0,0 +1,36 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class ResultSink:
+    """
+    collects the results the fitting workers hand back, so the parent writes
+    every region's coefficients and every store's hyperparameters to the
+    warehouse in one transaction instead of one connection per entity
+    """
+
+    region_rows: list
+    store_rows: list
+
+    def add_region_coefficients(self, region_number: str, coefficients) -> None:
+        self.region_rows.append([region_number, *[float(c) for c in coefficients]])
+
+    def add_store_parameters(
+        self, location_number: str, l1_ratio: float, alpha: float, mae: float
+    ) -> None:
+        self.store_rows.append(
+            [location_number, float(l1_ratio), float(alpha), float(mae)]
+        )
+
+    def flush(self, dw) -> None:
+        if len(self.region_rows) == 0 and len(self.store_rows) == 0:
+            log.info("no model results to write")
+            return
+        dw.write_model_results(self.region_rows, self.store_rows)
+        self.region_rows = []
+        self.store_rows = []
+
+    def __init__(self):
+        self.region_rows = []
+        self.store_rows = []
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+from elastic_net_model import warm_start_strategy
+
+log = logging.getLogger(__name__)
+
+
+class RetrainPlan:
+    """
+    what an incremental run does with each region or store. unchanged ones are
+    skipped, ones that only gained newer rows are warm started from their last
+    l1_ratio and alpha, everything else is fit from scratch.
+    """
+
+    fingerprints: dict
+    skipped: set
+    warm_starts: dict
+    params: dict
+
+    def to_fit(self, keys) -> list:
+        return [key for key in keys if key not in self.skipped]
+
+    def model_options(self, key, model_options: dict) -> dict:
+        """
+        a warm started fit replaces the configured search strategy with the
+        one that searches around its previous l1_ratio and alpha, the other
+        strategies would ignore them
+        """
+        if key not in self.warm_starts:
+            return model_options
+        return {
+            **model_options,
+            "search_strategy": warm_start_strategy,
+            "warm_start": self.warm_starts[key],
+        }
+
+    def record(self, key, l1_ratio: float, alpha: float) -> None:
+        self.params[key] = {"l1_ratio": float(l1_ratio), "alpha": float(alpha)}
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.skipped = set()
+        self.warm_starts = {}
+        self.params = {}
+
+
+class FingerprintStore:
+    """
+    JSON file of the fingerprint of each region's or store's feature matrix at
+    its last fit: row count, newest date_time and a hash of the rows in order,
+    together with the l1_ratio and alpha it was fit with.
+    """
+
+    path: str
+    state: dict
+
+    def plan(
+        self,
+        kind: str,
+        df: pd.DataFrame,
+        group_column: str,
+        columns: list,
+        time_column: str = "date_time",
+    ) -> RetrainPlan:
+        plan = RetrainPlan()
+        previous_fits = self.state.get(kind, {})
+        # one vectorized pass hashes every row, each group then hashes its slice of those
+        row_hashes = pd.util.hash_pandas_object(
+            df[columns + [time_column]], index=False
+        ).to_numpy()
+        times = df[time_column]
+        unchanged, appended = 0, 0
+
+        # ids are categoricals, observed leaves out stores and regions without rows
+        groups = df.groupby(group_column, sort=False, observed=True).indices
+        for key, positions in groups.items():
+            key_times = times.iloc[positions]
+            fingerprint = {
+                "rows": len(positions),
+                "watermark": str(key_times.max()),
+                "hash": self.hash_rows(row_hashes[positions]),
+            }
+            plan.fingerprints[key] = fingerprint
+            previous = previous_fits.get(str(key))
+            if previous is None:
+                continue
+
+            if fingerprint["hash"] == previous["hash"]:
+                plan.skipped.add(key)
+                plan.params[key] = previous["params"]
+                unchanged += 1
+                continue
+
+            # only new data if the rows up to the old watermark are exactly the old rows
+            is_prefix = (key_times <= pd.Timestamp(previous["watermark"])).to_numpy()
+            if fingerprint["rows"] > previous["rows"] and (
+                self.hash_rows(row_hashes[positions[is_prefix]]) == previous["hash"]
+            ):
+                plan.warm_starts[key] = previous["params"]
+                appended += 1
+
+        log.info(
+            f"{kind} fingerprints: {unchanged} unchanged, {appended} with new rows only, "
+            f"{len(plan.fingerprints) - unchanged - appended} to fit from scratch"
+        )
+        return plan
+
+    def save(self, kind: str, plan: RetrainPlan) -> None:
+        fits = self.state.setdefault(kind, {})
+        saved = 0
+        for key, params in plan.params.items():
+            # a checkpointed store can be gone from the data this plan was made from
+            if key not in plan.fingerprints:
+                log.warning(f"no {kind} fingerprint for {key}, its fit is not saved")
+                continue
+            fits[str(key)] = {**plan.fingerprints[key], "params": params}
+            saved += 1
+        # write then rename, so a crash never leaves a truncated file behind
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(self.state, f)
+        os.replace(f"{self.path}.tmp", self.path)
+        log.info(f"saved {saved} {kind} fingerprints to {self.path}")
+
+    def hash_rows(self, row_hashes) -> str:
+        return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
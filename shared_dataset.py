@@ -0,0 +1,84 @@
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+log = logging.getLogger(__name__)
+
+
+class DatasetSlice:
+    """
+    a contiguous row range of a SharedDataset. only the file path and the range
+    are pickled into a worker, load() maps the rows instead of copying them.
+    """
+
+    path: str
+    columns: list
+    start: int
+    stop: int
+
+    @property
+    def n_rows(self) -> int:
+        return self.stop - self.start
+
+    def load(self) -> pd.DataFrame:
+        matrix = np.load(self.path, mmap_mode="r")
+        return pd.DataFrame(
+            matrix[self.start : self.stop], columns=self.columns, copy=False
+        )
+
+    def __init__(self, path: str, columns: list, start: int, stop: int):
+        self.path = path
+        self.columns = columns
+        self.start = start
+        self.stop = stop
+
+
+class SharedDataset:
+    """
+    float64 feature matrix written once to a memory-mapped .npy file, with the
+    rows of each group stored as one contiguous range. every worker maps the
+    same pages read-only rather than receiving its own pickled copy.
+    """
+
+    path: str
+    columns: list
+    ranges: dict
+
+    def slice(self, key) -> DatasetSlice:
+        start, stop = self.ranges[key]
+        return DatasetSlice(self.path, self.columns, start, stop)
+
+    def close(self) -> None:
+        log.info(f"removing shared dataset {self.path}")
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __init__(
+        self, df: pd.DataFrame, group_column: str, columns: list, directory: str = None
+    ):
+        self._directory = tempfile.mkdtemp(prefix="weather_analytics_", dir=directory)
+        self.path = os.path.join(self._directory, "dataset.npy")
+        self.columns = columns
+        self.ranges = {}
+
+        log.info(f"writing {df.shape[0]} rows to shared dataset {self.path}")
+        matrix = open_memmap(
+            self.path, mode="w+", dtype=np.float64, shape=(df.shape[0], len(columns))
+        )
+        column_positions = df.columns.get_indexer(columns)
+        start = 0
+        # ids are categoricals, observed leaves out stores and regions without rows
+        groups = df.groupby(group_column, sort=False, observed=True).indices
+        for key, positions in groups.items():
+            stop = start + len(positions)
+            matrix[start:stop] = df.iloc[positions, column_positions].to_numpy(
+                dtype=np.float64
+            )
+            self.ranges[key] = (start, stop)
+            start = stop
+        matrix.flush()
+        del matrix
@@ -0,0 +1,49 @@
+import logging
+import re
+
+import psycopg2
+import psycopg2.extensions
+
+log = logging.getLogger(__name__)
+
+# named placeholders, %(location_number)s
+parameter_pattern = re.compile(r"%\((\w+)\)s")
+
+
+def statement_parameters(query: str) -> list:
+    """
+    the names of a query's parameters in order of first use
+    """
+    return list(dict.fromkeys(parameter_pattern.findall(query)))
+
+
+class StatementCachingConnection(psycopg2.extensions.connection):
+    """
+    connection_factory for psycopg2.connect. it prepares a statement the first
+    time it runs on the session and executes it by name after that, so the
+    per store and per zip code queries are planned once per connection rather
+    than once per key.
+
+    prepared statements live as long as the session and are not undone by a
+    rollback, so one is only recorded once its prepare succeeded.
+    """
+
+    def execute_prepared(self, cursor, name: str, query: str, params: dict = None) -> None:
+        parameters = statement_parameters(query)
+        if name not in self._prepared:
+            numbered = query
+            for i, parameter in enumerate(parameters, start=1):
+                numbered = numbered.replace(f"%({parameter})s", f"${i}")
+            cursor.execute(f"prepare {name} as {numbered}")
+            self._prepared.add(name)
+            log.debug(f"prepared statement {name} on connection {id(self)}")
+
+        if len(parameters) == 0:
+            cursor.execute(f"execute {name}")
+            return
+        placeholders = ", ".join(f"%({parameter})s" for parameter in parameters)
+        cursor.execute(f"execute {name} ({placeholders})", params)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prepared = set()
@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+def pack_store_batches(store_rows: dict, target_rows: int) -> list:
+    """
+    first fit decreasing bin packing of stores into batches of about target_rows
+    rows, so a worker picks up many small stores at once while a store larger
+    than the target gets a batch to itself. largest batches come first.
+    """
+    batches = []
+    batch_rows = []
+    for location_number in sorted(store_rows, key=store_rows.get, reverse=True):
+        n_rows = store_rows[location_number]
+        for i in range(len(batches)):
+            if batch_rows[i] + n_rows <= target_rows:
+                batches[i].append(location_number)
+                batch_rows[i] += n_rows
+                break
+        else:
+            batches.append([location_number])
+            batch_rows.append(n_rows)
+    return batches
+
+
+class FitCheckpoint:
+    """
+    append-only JSON lines file of finished store fits. a restarted run reads it
+    back and only fits the stores it does not list. it is removed once the
+    results are safely written to the warehouse.
+    """
+
+    path: str
+    results: dict
+
+    def record(self, results: list) -> None:
+        with open(self.path, "a") as f:
+            for location_number, l1_ratio, alpha, mae in results:
+                f.write(
+                    json.dumps(
+                        {
+                            "location_number": location_number,
+                            "l1_ratio": l1_ratio,
+                            "alpha": alpha,
+                            "mae": mae,
+                        }
+                    )
+                    + "\n"
+                )
+                self.results[location_number] = (location_number, l1_ratio, alpha, mae)
+            # a batch is only finished once it is on disk
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self) -> None:
+        log.info(f"removing fit checkpoint {self.path}")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    # the tail of a write the crash cut short
+                    log.warning(f"skipping unreadable line in fit checkpoint {self.path}")
+                    continue
+                self.results[row["location_number"]] = (
+                    row["location_number"],
+                    row["l1_ratio"],
+                    row["alpha"],
+                    row["mae"],
+                )
+        log.info(f"resuming from {len(self.results)} stores in fit checkpoint {self.path}")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results = {}
+        self.load()
@@ -0,0 +1,56 @@
+import os
+import urllib.parse
+
+import pytest
+
+for variable in ["DBHOST", "DBPORT", "DBNAME", "DBUSER", "DBPASSWORD", "WEATHERAPIKEY"]:
+    os.environ.setdefault(variable, "1" if variable == "DBPORT" else "test")
+
+# the redshift functions the queries use that postgres does not have
+redshift_functions = """
+create or replace function convert_timezone(text, text, timestamp) returns timestamp
+    as $$ select ($3 at time zone $1) at time zone $2 $$ language sql immutable;
+create or replace function getdate() returns timestamp
+    as $$ select now()::timestamp $$ language sql stable;
+"""
+
+
+@pytest.fixture(scope="session")
+def postgres(tmp_path_factory):
+    """
+    a throwaway postgres server standing in for redshift, skipped where
+    pgserver is not installed
+    """
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="delete")
+    yield server
+    server.cleanup()
+
+
+@pytest.fixture
+def warehouse(postgres):
+    """
+    a RedshiftDW on a database of its own on the postgres fixture, dropped
+    when the test ends
+    """
+    from config import Config
+    from data_warehouse import RedshiftDW
+
+    name = "test_" + os.urandom(4).hex()
+    postgres.psql(f"create database {name};")
+    uri = urllib.parse.urlparse(postgres.get_uri())
+    config = Config()
+    config.db_host = urllib.parse.parse_qs(uri.query)["host"][0]
+    config.db_port = uri.port or 5432
+    config.db_name = name
+    config.db_user = uri.username
+    config.db_password = uri.password or ""
+    config.db_pool_size = 0
+    config.cache_dir = None
+    dw = RedshiftDW(config)
+    with dw.cursor() as cursor:
+        cursor.execute(redshift_functions + "create schema dw;")
+        cursor.connection.commit()
+    yield dw
+    dw.close_pool()
+    postgres.psql(f"drop database {name} with (force);")
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from elastic_net_model import regressors, predictor
+from frame_schema import join_store_attributes
+from retraining import FingerprintStore
+from shared_dataset import SharedDataset
+
+
+def create_store_data(n_rows: list) -> pd.DataFrame:
+    """
+    assembled training frame of one region with a store per entry of n_rows,
+    the way assemble_store_frames joins the store attributes back
+    """
+    stores = pd.DataFrame(
+        {
+            "region_number": "1",
+            "location_number": [str(10000 + i) for i in range(len(n_rows))],
+            "is_closed_sunday": 0,
+            "summer_hours_open": 7,
+            "summer_hours_close": 19,
+            "winter_hours_open": 8,
+            "winter_hours_close": 18,
+            "time_zone": "America/Chicago",
+        }
+    )
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(
+        rng.integers(0, 5, (sum(n_rows), len(regressors + predictor))),
+        columns=regressors + predictor,
+    )
+    features["date_time"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        np.concatenate([np.arange(n) for n in n_rows]), unit="h"
+    )
+    return join_store_attributes(features, stores, n_rows)
+
+
+def test_shared_dataset_leaves_out_stores_without_rows(tmp_path):
+    df = create_store_data([30, 0, 20])
+    assert df["location_number"].dtype == "category"
+
+    dataset = SharedDataset(df, "location_number", regressors + predictor, str(tmp_path))
+    try:
+        assert dataset.ranges == {"10000": (0, 30), "10002": (30, 50)}
+        assert dataset.slice("10002").load().shape == (20, len(regressors + predictor))
+    finally:
+        dataset.close()
+
+
+def test_fingerprints_leave_out_stores_without_rows(tmp_path):
+    df = create_store_data([30, 0, 20])
+
+    plan = FingerprintStore(str(tmp_path / "fingerprints.json")).plan(
+        "store", df, "location_number", regressors + predictor
+    )
+    assert set(plan.fingerprints) == {"10000", "10002"}
+    assert plan.to_fit(["10000", "10002"]) == ["10000", "10002"]
@@ -0,0 +1,42 @@
+import multiprocessing
+
+import joblib
+from joblib import Parallel, delayed, parallel_config
+from threadpoolctl import threadpool_info
+
+from execution_budget import ExecutionBudget, region_worker_pool
+
+
+def blas_thread_limits() -> set:
+    return {pool["num_threads"] for pool in threadpool_info()}
+
+
+def probe_region_worker(cv_jobs: int, blas_threads: int) -> tuple:
+    # the same joblib settings ElasticNetModel.run_search fits under
+    with parallel_config(backend="loky", inner_max_num_threads=blas_threads):
+        n_jobs = joblib.effective_n_jobs(cv_jobs)
+        cv_worker_limits = Parallel(n_jobs=cv_jobs)(
+            delayed(blas_thread_limits)() for _ in range(cv_jobs)
+        )
+    return (
+        multiprocessing.current_process().daemon,
+        n_jobs,
+        blas_thread_limits(),
+        set().union(*cv_worker_limits),
+    )
+
+
+def test_region_workers_run_their_cv_jobs():
+    budget = ExecutionBudget(8, 2, 2)
+    assert budget.blas_threads == 2
+
+    with region_worker_pool(budget) as pool:
+        daemon, n_jobs, worker_limits, cv_worker_limits = pool.submit(
+            probe_region_worker, budget.cv_jobs, budget.blas_threads
+        ).result()
+
+    assert not daemon
+    assert n_jobs == budget.cv_jobs
+    # no blas library loaded means no limits to report
+    assert worker_limits <= {budget.blas_threads}
+    assert cv_worker_limits <= {budget.blas_threads}
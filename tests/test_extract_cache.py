@@ -0,0 +1,82 @@
+import pandas as pd
+
+from extract_cache import ExtractCache
+
+
+def create_orders(start: str, car_counts: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "date_time": pd.date_range(start, periods=len(car_counts), freq="h"),
+            "car_count": car_counts,
+        }
+    )
+
+
+def test_refresh_overlaps_a_day_and_keeps_fresh_rows(tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    cached = pd.concat(
+        [create_orders("2024-03-01 20:00", [5, 5]), create_orders("2024-03-02 17:00", [3, 3])],
+        ignore_index=True,
+    )
+    cache.refresh("orders", "10000", "date_time", lambda since: cached)
+
+    requested = []
+
+    def fetch(since):
+        requested.append(since)
+        # the first hour is cut in two by the utc filter, 18:00 gained an order
+        return pd.concat(
+            [create_orders("2024-03-01 21:00", [1]), create_orders("2024-03-02 18:00", [4, 6])],
+            ignore_index=True,
+        )
+
+    merged = cache.refresh("orders", "10000", "date_time", fetch)
+
+    assert requested == [pd.Timestamp("2024-03-01")]
+    assert merged["date_time"].is_unique
+    assert merged.set_index("date_time")["car_count"].to_dict() == {
+        pd.Timestamp("2024-03-01 20:00"): 5,
+        pd.Timestamp("2024-03-01 21:00"): 5,
+        pd.Timestamp("2024-03-02 17:00"): 3,
+        pd.Timestamp("2024-03-02 18:00"): 4,
+        pd.Timestamp("2024-03-02 19:00"): 6,
+    }
+
+
+def test_key_without_rows_is_not_fetched_in_full_again(tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    requested = []
+
+    def fetch(since):
+        requested.append(since)
+        return create_orders("2024-03-01", [])
+
+    cache.refresh("orders", "10000", "date_time", fetch)
+    cache.refresh("orders", "10000", "date_time", fetch)
+
+    assert requested[0] is None
+    assert requested[1] is not None
+    assert cache.stats["hits"] == 1
+
+
+def test_refresh_fetches_each_watermark_date_on_its_own(tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    history = {
+        "10000": create_orders("2024-03-01 20:00", [5]),
+        "10001": create_orders("2024-03-01 09:00", [2]),
+        "10002": create_orders("2023-06-01 09:00", [1]),
+    }
+    cache.refresh_many("orders", list(history), "date_time", lambda keys, since: history)
+
+    requested = []
+
+    def fetch(keys, since):
+        requested.append((sorted(keys), since))
+        return {key: create_orders("2024-03-02", []) for key in keys}
+
+    cache.refresh_many("orders", list(history), "date_time", fetch)
+
+    assert requested == [
+        (["10002"], pd.Timestamp("2023-05-31")),
+        (["10000", "10001"], pd.Timestamp("2024-02-29")),
+    ]
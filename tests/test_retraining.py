@@ -0,0 +1,38 @@
+import json
+
+from elastic_net_model import regressors, predictor, warm_start_strategy
+from retraining import FingerprintStore
+from tests.test_empty_groups import create_store_data
+
+
+def test_save_skips_stores_without_fingerprint(tmp_path):
+    path = str(tmp_path / "fingerprints.json")
+    store = FingerprintStore(path)
+    plan = store.plan("store", create_store_data([30, 20]), "location_number", regressors + predictor)
+    plan.record("10000", 0.5, 0.1)
+    # finished in a checkpoint of an earlier run, no longer in the data
+    plan.record("19999", 0.5, 0.1)
+    store.save("store", plan)
+
+    with open(path) as f:
+        saved = json.load(f)
+    assert set(saved["store"]) == {"10000"}
+    assert saved["store"]["10000"]["params"] == {"l1_ratio": 0.5, "alpha": 0.1}
+
+
+def test_warm_starts_use_the_warm_start_strategy(tmp_path):
+    path = str(tmp_path / "fingerprints.json")
+    store = FingerprintStore(path)
+    plan = store.plan("store", create_store_data([30]), "location_number", regressors + predictor)
+    plan.record("10000", 0.5, 0.1)
+    store.save("store", plan)
+
+    plan = FingerprintStore(path).plan(
+        "store", create_store_data([40]), "location_number", regressors + predictor
+    )
+    options = {"search_strategy": "path"}
+    assert plan.model_options("10000", options) == {
+        "search_strategy": warm_start_strategy,
+        "warm_start": {"l1_ratio": 0.5, "alpha": 0.1},
+    }
+    assert plan.model_options("10001", options) is options
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from elastic_net_model import ElasticNetModel, regressors, predictor
+from main import remove_untrainable
+
+
+def test_threshold_matches_the_model():
+    n_rows = {"10000": 10, "10001": 11, "10002": 0, "10003": 500}
+    remove_untrainable(n_rows, "stores")
+    assert n_rows == {"10001": 11, "10003": 500}
+
+
+def test_model_accepts_what_the_filter_keeps():
+    for rows in [10, 11]:
+        data = pd.DataFrame(1.0, index=range(rows), columns=regressors + predictor)
+        m = ElasticNetModel(data)
+        assert hasattr(m, "x_train") == ElasticNetModel.has_enough_rows(rows)
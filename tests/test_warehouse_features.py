@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from main import get_store_data
+
+create_source_tables = """
+create table dw.dim_locations (
+    location_id int,
+    location_number varchar(256),
+    region_number varchar(256),
+    zip_code varchar(16),
+    timezone_id varchar(64)
+);
+create table dw.weather (
+    zip_code varchar(16),
+    weather_date date,
+    condition_text varchar(256),
+    total_precipitation float8
+);
+create table dw.orders (
+    order_id int,
+    location_id int,
+    created_at timestamp,
+    deleted_at timestamp,
+    is_business_hours varchar(8),
+    service_item_id int
+);
+create table public.weather_iq_store_parameters (
+    location_number varchar(256),
+    is_closed_sunday boolean,
+    summer_hours_open int,
+    summer_hours_close int,
+    winter_hours_open int,
+    winter_hours_close int,
+    time_zone varchar(64),
+    l1_ratio float8,
+    alpha float8,
+    en_mae float8,
+    updated_at timestamp
+);
+"""
+
+stores = [
+    # location_id, location_number, zip_code, time zone, closed on sundays
+    (1, "10000", "60601", "America/Chicago", True),
+    (2, "10001", "60601", "America/Chicago", False),
+    (3, "10002", "85001", "America/Phoenix", True),
+]
+
+weather_dates = pd.to_datetime(
+    [
+        # daylight saving time starts on sunday the 10th and ends on sunday november 3rd
+        "2024-03-08", "2024-03-09", "2024-03-10", "2024-03-11",
+        "2024-11-02", "2024-11-03", "2024-11-04",
+        # thanksgiving is a holiday, christmas eve has adjusted hours
+        "2024-11-27", "2024-11-28", "2024-12-24",
+    ]
+)
+
+conditions = [
+    "Sunny",
+    "\u00a0Partly cloudy\t",
+    " Moderate rain\n",
+    "Patchy light snow",
+    "Thundery outbreaks possible",
+    "Overcast ",
+    "Volcanic ash",
+    "Light freezing rain",
+    "CLEAR",
+    "Mist",
+]
+
+
+def create_source_rows(warehouse) -> None:
+    rng = np.random.default_rng(0)
+    weather_rows = [
+        (zip_code, date.date(), conditions[(i + j) % len(conditions)], float(rng.integers(0, 30)))
+        for j, zip_code in enumerate(["60601", "85001"])
+        for i, date in enumerate(weather_dates)
+    ]
+    # a missing precipitation is read as none
+    weather_rows[1] = (*weather_rows[1][:3], None)
+
+    order_rows = []
+    for location_id, _, _, _, _ in stores:
+        for date in weather_dates:
+            # every utc hour of the day before to the day after, so each local hour has orders
+            for hour in range(-24, 48):
+                for _ in range(rng.integers(0, 4)):
+                    order_rows.append(
+                        (
+                            len(order_rows),
+                            location_id,
+                            date + pd.Timedelta(hours=hour, minutes=int(rng.integers(0, 60))),
+                            None,
+                            "true",
+                            1,
+                        )
+                    )
+    # deleted orders and orders without a service item are not counted
+    order_rows.append((len(order_rows), 1, weather_dates[0] + pd.Timedelta(hours=15), weather_dates[0], "true", 1))
+    order_rows.append((len(order_rows), 1, weather_dates[0] + pd.Timedelta(hours=15), None, "true", None))
+
+    with warehouse.cursor() as cursor:
+        cursor.execute(create_source_tables)
+        execute_values(
+            cursor,
+            "insert into dw.dim_locations values %s",
+            [(i, number, "1", zip_code, tz) for i, number, zip_code, tz, _ in stores],
+        )
+        execute_values(
+            cursor,
+            "insert into public.weather_iq_store_parameters "
+            "(location_number, is_closed_sunday, summer_hours_open, summer_hours_close, "
+            "winter_hours_open, winter_hours_close, time_zone) values %s",
+            [(number, closed, 7, 19, 8, 18, tz) for _, number, _, tz, closed in stores],
+        )
+        execute_values(cursor, "insert into dw.weather values %s", weather_rows)
+        execute_values(
+            cursor,
+            "insert into dw.orders values %s",
+            [(i, l, t.to_pydatetime(), d, b, s) for i, l, t, d, b, s in order_rows],
+        )
+        cursor.connection.commit()
+
+
+def test_warehouse_features_match_local_features(warehouse):
+    create_source_rows(warehouse)
+
+    local = get_store_data(warehouse, feature_mode="local")
+    in_warehouse = get_store_data(warehouse, feature_mode="warehouse")
+
+    assert local.shape[0] > 0
+    assert set(local["location_number"]) == {"10000", "10001", "10002"}
+    pd.testing.assert_frame_equal(in_warehouse, local)
@@ -0,0 +1,38 @@
+import datetime
+
+from psycopg2.extras import execute_values
+
+
+def write_weather(warehouse, rows: list) -> None:
+    with warehouse.cursor() as cursor:
+        cursor.execute(
+            "create table if not exists dw.weather (zip_code varchar(16), weather_date date, "
+            "condition_text varchar(256), total_precipitation float8); truncate dw.weather;"
+        )
+        execute_values(cursor, "insert into dw.weather values %s", rows)
+        cursor.connection.commit()
+
+
+def test_forecasts_are_not_cached(warehouse, tmp_path):
+    from extract_cache import ExtractCache
+
+    warehouse.cache = ExtractCache(str(tmp_path))
+    today = datetime.date.today()
+    days = [today + datetime.timedelta(days=i) for i in range(-3, 4)]
+    # the day before yesterday is observed, the rest still forecast
+    write_weather(
+        warehouse,
+        [("60601", day, "Sunny" if day < today - datetime.timedelta(days=1) else "Mist", 0)
+         for day in days],
+    )
+    warehouse.get_historic_weather_by_zip_codes(["60601"])
+    assert warehouse.cache.read("weather", "60601")["weather_date"].max() == (
+        today - datetime.timedelta(days=1)
+    )
+
+    # a day later yesterday's forecast has been overwritten by the observation
+    write_weather(warehouse, [("60601", day, "Sunny", 0) for day in days])
+    hourly = warehouse.get_historic_weather_by_zip_codes(["60601"])["60601"]
+
+    assert set(hourly["condition"]) == {"Sunny"}
+    assert hourly["date_time"].max().date() == today - datetime.timedelta(days=1)
@@ -0,0 +1,85 @@
+import logging
+
+import pytest
+
+import data_warehouse
+from error_types import RedshiftDWError
+
+create_result_tables = """
+create table public.weather_iq_store_parameters (
+    location_number varchar(256),
+    l1_ratio float8,
+    alpha float8,
+    en_mae float8,
+    updated_at timestamp
+);
+insert into public.weather_iq_store_parameters (location_number) values ('10000'), ('10001');
+create table public.weather_analytics_region_coefficients (
+    region_number varchar(256),
+    hour_coefficient float8,
+    precipitation_coefficient float8,
+    is_holiday_coefficient float8,
+    adj_hours_coefficeint float8,
+    cloud_cover_coefficient float8,
+    rain_intensity_coefficient float8,
+    sleet_intensity_coefficient float8,
+    snow_intensity_coefficient float8,
+    ice_intensity_coefficient float8,
+    thunder_intensity_coefficient float8,
+    created_at timestamp,
+    updated_at timestamp
+);
+"""
+
+
+def query(warehouse, sql: str) -> list:
+    with warehouse.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def create_tables(warehouse) -> None:
+    with warehouse.cursor() as cursor:
+        cursor.execute(create_result_tables)
+        cursor.connection.commit()
+
+
+def test_store_parameters_are_updated_through_the_staging_table(warehouse):
+    create_tables(warehouse)
+
+    warehouse.write_model_results(
+        [("1", *range(10))],
+        [("10000", 0.5, 0.1, 2.5), ("10002", 0.9, 0.9, 9.9)],
+    )
+
+    assert query(
+        warehouse,
+        "select location_number, l1_ratio, alpha, en_mae, updated_at is not null "
+        "from public.weather_iq_store_parameters order by location_number",
+    ) == [("10000", 0.5, 0.1, 2.5, True), ("10001", None, None, None, False)]
+    assert query(
+        warehouse,
+        "select region_number, thunder_intensity_coefficient "
+        "from public.weather_analytics_region_coefficients",
+    ) == [("1", 9.0)]
+    # the staging table is dropped with the write
+    assert query(warehouse, "select to_regclass('store_parameters_staging')") == [(None,)]
+
+
+def test_failed_page_is_logged_and_nothing_is_written(warehouse, monkeypatch, caplog):
+    create_tables(warehouse)
+    monkeypatch.setattr(data_warehouse, "write_page_size", 2)
+
+    with caplog.at_level(logging.ERROR), pytest.raises(RedshiftDWError):
+        warehouse.write_model_results(
+            [("1", *range(10))],
+            [("10000", 0.5, 0.1, 2.5), ("10001", 0.5, 0.1, 2.5), ("10002", "x", 0.1, 2.5)],
+        )
+
+    assert "writing store rows 2 to 2 failed, stores 10002 to 10002" in caplog.text
+    assert query(
+        warehouse, "select count(*) from public.weather_analytics_region_coefficients"
+    ) == [(0,)]
+    assert query(
+        warehouse, "select count(l1_ratio) from public.weather_iq_store_parameters"
+    ) == [(0,)]